@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+from typing import Any, Dict, List
+
+from langchain.agents import AgentExecutor, create_react_agent
+from langchain.memory import ConversationBufferMemory
+from langchain.prompts import PromptTemplate
+from langchain.tools import BaseTool
+from langchain_mistralai.chat_models import ChatMistralAI
+from pydantic import Field
+
+from llm_gateway import CALL_TIMEOUT, GatewayChatModel
+
+_chat_model = None
+_chat_model_lock = threading.Lock()
+
+# Define tools
+class RiskAnalyzerTool(BaseTool):
+    name: str = "risk_analyzer"
+    description: str = "Analyzes security risks based on survey responses"
+    data_processor: Any = Field(default=None)
+    
+    def _run(self, answers: str) -> List[str]:
+        answers_dict = json.loads(answers)
+        return self.data_processor.analyze_risks(answers_dict)
+    
+    async def _arun(self, answers: str) -> List[str]:
+        raise NotImplementedError("Async not implemented")
+
+class MitigationTool(BaseTool):
+    name: str = "mitigation_finder"
+    description: str = "Finds comprehensive mitigation steps for identified risks"
+    data_processor: Any = Field(default=None)
+    
+    def _run(self, risk_type: str) -> Dict:
+        return self.data_processor.get_mitigation_steps(risk_type)
+    
+    async def _arun(self, risk_type: str) -> Dict:
+        raise NotImplementedError("Async not implemented")
+
+class AssuranceMetricsTool(BaseTool):
+    name: str = "assurance_metrics"
+    description: str = "Gets detailed assurance metrics for security solutions"
+    data_processor: Any = Field(default=None)
+    
+    def _run(self, solution: str) -> Dict:
+        return self.data_processor.get_solution_details(solution)
+    
+    async def _arun(self, solution: str) -> Dict:
+        raise NotImplementedError("Async not implemented")
+
+def get_chat_model():
+    """Process-wide Mistral client; every call goes through the LLM gateway"""
+    global _chat_model
+    with _chat_model_lock:
+        if _chat_model is None:
+            _chat_model = GatewayChatModel(model=ChatMistralAI(
+                mistral_api_key=os.getenv("MISTRAL_API_KEY"),
+                model="mistral-large",
+                # The gateway owns retries and deadlines
+                max_retries=0,
+                timeout=CALL_TIMEOUT))
+        return _chat_model
+
+def build_agent_executor(data_processor):
+    """LangChain agent over the risk tools for one session"""
+    llm = get_chat_model()
+    memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+    
+    tools = [
+        RiskAnalyzerTool(data_processor=data_processor),
+        MitigationTool(data_processor=data_processor),
+        AssuranceMetricsTool(data_processor=data_processor)
+    ]
+    
+    prompt = PromptTemplate.from_template(
+        """You are a security risk assessment expert. Use the available tools to analyze risks 
+        and provide recommendations.
+
+        Current conversation:
+        {chat_history}
+
+        Human: {input}
+        Assistant: Let me help you with that analysis.
+
+        Available Tools:
+        {tools}
+
+        {agent_scratchpad}
+
+        Tool Names: {tool_names}
+        """
+    )
+
+    agent = create_react_agent(
+        llm=llm,
+        tools=tools,
+        prompt=prompt
+    )
+
+    return AgentExecutor.from_agent_and_tools(
+        agent=agent,
+        tools=tools,
+        memory=memory,
+        verbose=True,
+        handle_parsing_errors=True
+    )
@@ -0,0 +1,177 @@
+"""Streaming export of assessments for analytics, as NDJSON or Parquet.
+
+Each record holds a session's knowledge-base ID, store data, answers,
+identified risks and area summary. Records are produced by generators and
+written out in batches, so memory stays constant however many sessions are
+exported. Passing `since` exports only sessions updated after that time. The
+response carries a watermark to use as the next `since`.
+
+Usage (against a running backend):
+    python analytics_export.py -o assessments.parquet --format parquet [--since 2025-01-01T00:00:00Z]
+    python analytics_export.py -o delta.ndjson --state export_state.json   # incremental
+"""
+import argparse
+import json
+import math
+import os
+from datetime import datetime, timezone
+
+import orjson
+
+from portfolio import AREA_COUNTS
+from streams import ChunkSink
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet'
+}
+
+# Rows per Parquet row group, and so per streamed chunk
+PARQUET_BATCH_SIZE = 1000
+
+
+def parse_since(value):
+    """Epoch seconds from an ISO 8601 timestamp or a number; None if empty"""
+    if value in (None, ''):
+        return None
+    try:
+        since = float(value)
+    except ValueError:
+        pass
+    else:
+        if not math.isfinite(since):
+            raise ValueError(f"since must be finite: {value}")
+        return since
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def isoformat(epoch_seconds):
+    return datetime.fromtimestamp(epoch_seconds, timezone.utc).isoformat().replace('+00:00', 'Z')
+
+
+def area_summary(area_data):
+    if not area_data or not area_data.get('success', False):
+        return None
+    return {name: count(area_data) for name, count in AREA_COUNTS.items()}
+
+
+def session_record(session):
+    data_processor = session.data_processor
+    return {
+        'session_id': session.session_id,
+        'kb_id': session.kb_id,
+        'state': session.state,
+        'created_at': session.created_at,
+        'updated_at': session.updated_at,
+        # Strings throughout, as the Parquet map columns require
+        'store_data': {key: str(value) for key, value in session.store_info.store_data.items()},
+        'answers': {key: str(value) for key, value in session.answers.items()},
+        'risks': data_processor.from_bits(session.risk_bits, data_processor.risks),
+        'area_summary': area_summary(session.area_data)
+    }
+
+
+def export_records(sessions, since=None):
+    """Records of sessions updated after since, one at a time"""
+    # Snapshot the references only; sessions may be added or removed meanwhile
+    for session in list(sessions.values()):
+        if since is None or session.updated_at > since:
+            yield session_record(session)
+
+
+def ndjson_stream(records):
+    for record in records:
+        record = dict(record, created_at=isoformat(record['created_at']), updated_at=isoformat(record['updated_at']))
+        yield orjson.dumps(record) + b"\n"
+
+
+def parquet_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ('session_id', pa.string()),
+        ('kb_id', pa.string()),
+        ('state', pa.string()),
+        ('created_at', pa.timestamp('ms', tz='UTC')),
+        ('updated_at', pa.timestamp('ms', tz='UTC')),
+        ('store_data', pa.map_(pa.string(), pa.string())),
+        ('answers', pa.map_(pa.string(), pa.string())),
+        ('risks', pa.list_(pa.string())),
+        ('area_summary', pa.struct([(name, pa.int32()) for name in AREA_COUNTS]))
+    ])
+
+
+def parquet_stream(records, batch_size=PARQUET_BATCH_SIZE):
+    """Yield a Parquet file one row group at a time"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = parquet_schema()
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema, compression='zstd')
+
+    def write(batch):
+        columns = {name: [row[name] for row in batch] for name in schema.names}
+        for name in ('created_at', 'updated_at'):
+            columns[name] = [int(value * 1000) for value in columns[name]]
+        for name in ('store_data', 'answers'):
+            columns[name] = [list(value.items()) for value in columns[name]]
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            write(batch)
+            batch = []
+            yield sink.drain()
+    if batch:
+        write(batch)
+    writer.close()
+    yield sink.drain()
+
+
+def export_stream(sessions, export_format, since=None):
+    records = export_records(sessions, since)
+    if export_format == 'parquet':
+        return parquet_stream(records)
+    return ndjson_stream(records)
+
+
+def main():
+    import requests
+
+    parser = argparse.ArgumentParser(description="Export assessments from a running backend for analytics")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+    parser.add_argument("--url", default=os.getenv("BACKEND_URL", "http://localhost:5000"))
+    parser.add_argument("--since", help="ISO 8601 timestamp or epoch seconds")
+    parser.add_argument("--state", help="JSON file holding the watermark between incremental runs")
+    args = parser.parse_args()
+
+    since = args.since
+    if since is None and args.state and os.path.exists(args.state):
+        with open(args.state) as f:
+            since = json.load(f).get('watermark')
+
+    params = {'format': args.format}
+    if since is not None:
+        params['since'] = since
+    with requests.get(f"{args.url}/api/export", params=params, stream=True, timeout=60) as response:
+        response.raise_for_status()
+        with open(args.output, "wb") as out:
+            for chunk in response.iter_content(chunk_size=1 << 16):
+                out.write(chunk)
+        watermark = response.headers.get('X-Export-Watermark')
+
+    if args.state and watermark:
+        with open(args.state, "w") as f:
+            json.dump({'watermark': watermark}, f)
+    print(f"Exported to {args.output} (watermark {watermark})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,34 @@
-from flask import Flask, request, jsonify, send_file
-from fpdf.enums import XPos, YPos
+from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
-import pandas as pd
-import json
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import os
+import io
+import hashlib
+import gzip
+import threading
 import base64
-from fpdf import FPDF
 from typing import Dict, List, Any, Optional
-from langchain_mistralai.chat_models import ChatMistralAI
-from langchain.memory import ConversationBufferMemory
-from langchain.tools import BaseTool
-from langchain.agents import AgentExecutor, create_react_agent
-from langchain.prompts import PromptTemplate
-from pydantic import Field
 import uuid
-from dotenv import load_dotenv
-import googlemaps
-import requests
-from geopy.geocoders import Nominatim
 import time
-from reportlab.lib.pagesizes import letter
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
+from dotenv import load_dotenv
+import math
+import random
+import orjson
+from fragments import report_fragments
+from knowledge_bases import DEFAULT_KB_ID, DEFAULT_KB_PATH, KnowledgeBaseRegistry, UnknownKnowledgeBase
+from portfolio import PortfolioAnalysis, assessment_error
+from spatial_index import place_index
+import bulk_export
+import analytics_export
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+# Heavy subsystems (pandas, the LangChain agent, geocoding/Places clients and
+# ReportLab) are imported on first use or by prewarm(), keeping cold start fast
 load_dotenv()
 
 app = Flask(__name__)
@@ -34,64 +37,350 @@ CORS(app)
 # Load the API key from environment variables
 MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY")
 
-# Define tools and data processor
-class RiskAnalyzerTool(BaseTool):
-    name: str = "risk_analyzer"
-    description: str = "Analyzes security risks based on survey responses"
-    data_processor: Any = Field(default=None)
-    
-    def _run(self, answers: str) -> List[str]:
-        answers_dict = json.loads(answers)
-        return self.data_processor.analyze_risks(answers_dict)
-    
-    async def _arun(self, answers: str) -> List[str]:
-        raise NotImplementedError("Async not implemented")
+def notna(value) -> bool:
+    """pd.notna for a single cell, without importing pandas at module load"""
+    if value is None:
+        return False
+    try:
+        return bool(value == value)  # NaN and NaT compare unequal to themselves
+    except TypeError:
+        return False  # pd.NA refuses boolean conversion
 
-class MitigationTool(BaseTool):
-    name: str = "mitigation_finder"
-    description: str = "Finds comprehensive mitigation steps for identified risks"
-    data_processor: Any = Field(default=None)
-    
-    def _run(self, risk_type: str) -> Dict:
-        return self.data_processor.get_mitigation_steps(risk_type)
-    
-    async def _arun(self, risk_type: str) -> Dict:
-        raise NotImplementedError("Async not implemented")
-
-class AssuranceMetricsTool(BaseTool):
-    name: str = "assurance_metrics"
-    description: str = "Gets detailed assurance metrics for security solutions"
-    data_processor: Any = Field(default=None)
-    
-    def _run(self, solution: str) -> Dict:
-        return self.data_processor.get_solution_details(solution)
-    
-    async def _arun(self, solution: str) -> Dict:
-        raise NotImplementedError("Async not implemented")
+# The survey plan is searched exactly while that stays small; larger question
+# sheets are estimated from a fixed number of simulated surveys instead
+PLAN_EXACT_QUESTIONS = 64
+PLAN_EXACT_STATES = 20000
+PLAN_SAMPLES = 500
 
 class DataProcessor:
-    def __init__(self):
+    def __init__(self, path=DEFAULT_KB_PATH):
+        import pandas as pd
+        
         try:
-            self.survey_data = pd.read_excel("assumption.xlsx", sheet_name="Survey Questions")
-            self.risk_matrix = pd.read_excel("assumption.xlsx", sheet_name="Risk > Mitigation Matrix")
-            self.assurance_matrix = pd.read_excel("assumption.xlsx", sheet_name="Assurance Metrics")
+            with open(path, "rb") as f:
+                content = f.read()
+            # Content hash identifies the knowledge base for cached fragments
+            self.kb_version = hashlib.sha256(content).hexdigest()[:16]
+            workbook = pd.ExcelFile(io.BytesIO(content))
+            self.survey_data = pd.read_excel(workbook, sheet_name="Survey Questions")
+            self.risk_matrix = pd.read_excel(workbook, sheet_name="Risk > Mitigation Matrix")
+            self.assurance_matrix = pd.read_excel(workbook, sheet_name="Assurance Metrics")
         except Exception as e:
             print(f"Error loading Excel file: {str(e)}")
             raise
+        self.question_risks = self.build_question_risk_map()
+        self.risk_solutions = self.build_risk_solution_map()
+        self.build_incidence_bits()
+
+    @staticmethod
+    def is_negative(answer: str) -> bool:
+        return answer.lower() in ['no', 'n']
+
+    def build_question_risk_map(self) -> Dict[str, frozenset]:
+        """Map each survey question to the risks flagged by a "No" answer"""
+        question_risks = {}
+        for _, row in self.survey_data.iterrows():
+            risks = str(row['Risk Present']).split(',') if notna(row['Risk Present']) else []
+            # Keep the first row for duplicated questions, as the sheet lookup did
+            question_risks.setdefault(
+                row['Question'],
+                frozenset(risk.strip() for risk in risks if risk.strip())
+            )
+        return question_risks
+
+    def build_incidence_bits(self):
+        """Intern questions, risks and solutions as bit positions and precompute
+        the question -> risk and risk -> solution relations as bit rows"""
+        self.questions = list(self.question_risks)
+        self.question_ids = {question: idx for idx, question in enumerate(self.questions)}
+
+        all_risks = set(self.risk_solutions)
+        for risks in self.question_risks.values():
+            all_risks.update(risks)
+        self.risks = sorted(all_risks)
+        self.risk_ids = {risk: idx for idx, risk in enumerate(self.risks)}
+
+        all_solutions = set()
+        for solutions in self.risk_solutions.values():
+            all_solutions.update(solutions)
+        self.solutions = sorted(all_solutions)
+        self.solution_ids = {solution: idx for idx, solution in enumerate(self.solutions)}
+
+        self.question_risk_bits = [
+            self.to_bits(self.question_risks[question], self.risk_ids) for question in self.questions
+        ]
+        self.risk_solution_bits = [
+            self.to_bits(self.risk_solutions.get(risk, ()), self.solution_ids) for risk in self.risks
+        ]
+        # Transpose: the risks that call for each solution
+        self.solution_risk_bits = [0] * len(self.solutions)
+        for risk_idx, solution_bits in enumerate(self.risk_solution_bits):
+            while solution_bits:
+                low = solution_bits & -solution_bits
+                self.solution_risk_bits[low.bit_length() - 1] |= 1 << risk_idx
+                solution_bits ^= low
+
+    @staticmethod
+    def to_bits(names, ids) -> int:
+        bits = 0
+        for name in names:
+            bits |= 1 << ids[name]
+        return bits
+
+    @staticmethod
+    def from_bits(bits, names) -> List[str]:
+        found = []
+        while bits:
+            low = bits & -bits
+            found.append(names[low.bit_length() - 1])
+            bits ^= low
+        return found
+
+    def union_bits(self, bits, rows) -> int:
+        """OR together the rows selected by the set bits"""
+        result = 0
+        while bits:
+            low = bits & -bits
+            result |= rows[low.bit_length() - 1]
+            bits ^= low
+        return result
+
+    def risk_bits(self, negative_bits) -> int:
+        return self.union_bits(negative_bits, self.question_risk_bits)
+
+    def solution_bits(self, risk_bits) -> int:
+        return self.union_bits(risk_bits, self.risk_solution_bits)
 
     def analyze_risks(self, answers: Dict[str, str]) -> List[str]:
-        identified_risks = set()
+        # Bits of answers packed by another knowledge-base version lay out a
+        # different question list, so those are matched by question text
+        if isinstance(answers, PackedAnswers) and answers.data_processor is self:
+            negative_bits = answers.negative
+        else:
+            negative_bits = 0
+            for question, answer in answers.items():
+                if question in self.question_ids and self.is_negative(answer):
+                    negative_bits |= 1 << self.question_ids[question]
+        return self.from_bits(self.risk_bits(negative_bits), self.risks)
+
+    def select_next_question(self, answered_bits: int, identified_bits: int) -> Optional[str]:
+        """Pick the unanswered question that can still flag the most undetermined risks.
+
+        A question whose risks have all been flagged by earlier "No" answers can no
+        longer change the outcome, so it is skipped. Ties keep sheet order.
+        """
+        best_question, best_gain = None, 0
+        for idx, risk_bits in enumerate(self.question_risk_bits):
+            if answered_bits >> idx & 1:
+                continue
+            gain = (risk_bits & ~identified_bits).bit_count()
+            if gain > best_gain:
+                best_question, best_gain = self.questions[idx], gain
+        return best_question
+
+    def expected_question_savings(self, p_no: float = 0.5) -> Dict[str, float]:
+        """Expected questions asked by the adaptive flow versus the full survey,
+        assuming each answer is independently "No" with probability p_no.
+
+        The exact search visits every reachable (answered, identified) state, which
+        can grow exponentially with the question count; past PLAN_EXACT_STATES it
+        gives way to a seeded Monte Carlo estimate, so the result is repeatable.
+        """
+        memo = {}
+
+        def expected_asked(answered, identified):
+            key = (answered, identified)
+            if key not in memo:
+                if len(memo) >= PLAN_EXACT_STATES:
+                    raise OverflowError("survey plan search too large")
+                question = self.select_next_question(answered, identified)
+                if question is None:
+                    memo[key] = 0.0
+                else:
+                    idx = self.question_ids[question]
+                    answered_next = answered | 1 << idx
+                    memo[key] = 1.0 + (
+                        p_no * expected_asked(answered_next, identified | self.question_risk_bits[idx])
+                        + (1 - p_no) * expected_asked(answered_next, identified)
+                    )
+            return memo[key]
+
+        total = len(self.questions)
+        estimate = 'exact'
+        try:
+            if total > PLAN_EXACT_QUESTIONS:
+                raise OverflowError("too many questions for an exact survey plan")
+            asked = expected_asked(0, 0)
+        except OverflowError:
+            estimate = 'sampled'
+            asked = self.sampled_questions_asked(p_no)
+        return {
+            'total_questions': total,
+            'expected_questions_asked': round(asked, 2),
+            'expected_questions_saved': round(total - asked, 2),
+            'saving_percentage': round(100 * (total - asked) / total, 1) if total else 0.0,
+            'estimate': estimate
+        }
+
+    def sampled_questions_asked(self, p_no: float, samples: int = PLAN_SAMPLES) -> float:
+        """Mean questions asked over simulated surveys with seeded random answers"""
+        rng = random.Random(0)
+        asked = 0
+        for _ in range(samples):
+            answered = identified = 0
+            question = self.select_next_question(answered, identified)
+            while question is not None:
+                idx = self.question_ids[question]
+                answered |= 1 << idx
+                if rng.random() < p_no:
+                    identified |= self.question_risk_bits[idx]
+                asked += 1
+                question = self.select_next_question(answered, identified)
+        return asked / samples
+
+    def answer_sensitivity(self, answered_bits: int, negative_bits: int) -> List[Dict[str, Any]]:
+        """What flipping each "No" answer to "Yes" would remove, biggest impact first.
+
+        One pass over the "No" answers counts how many flag each risk, capped at
+        two and kept as two bit planes. A risk flagged by exactly one answer goes
+        away with it, and a solution goes away when every identified risk calling
+        for it does. Questions the adaptive flow skipped could still flag their
+        risks, so a removal they could undo is reported as conditional: it holds
+        only if those questions would be answered "Yes". Ties keep sheet order.
+        """
+        flagged = flagged_twice = 0
+        bits = negative_bits
+        while bits:
+            low = bits & -bits
+            question_bits = self.question_risk_bits[low.bit_length() - 1]
+            flagged_twice |= flagged & question_bits
+            flagged |= question_bits
+            bits ^= low
+        flagged_once = flagged & ~flagged_twice
+
+        # Risks an unanswered question could still flag
+        pending = self.union_bits(~answered_bits & ((1 << len(self.questions)) - 1), self.question_risk_bits)
+
+        impacts = []
+        bits = negative_bits
+        while bits:
+            low = bits & -bits
+            idx = low.bit_length() - 1
+            bits ^= low
+            sole_risks = self.question_risk_bits[idx] & flagged_once
+            removed_solutions = conditional_solutions = 0
+            if sole_risks:
+                remaining = flagged & ~sole_risks
+                candidates = self.solution_bits(sole_risks)
+                while candidates:
+                    solution = candidates & -candidates
+                    callers = self.solution_risk_bits[solution.bit_length() - 1]
+                    if not callers & remaining:
+                        if callers & pending:
+                            conditional_solutions |= solution
+                        else:
+                            removed_solutions |= solution
+                    candidates ^= solution
+            impacts.append({
+                'question': self.questions[idx],
+                'risks_removed': self.from_bits(sole_risks & ~pending, self.risks),
+                'solutions_removed': self.from_bits(removed_solutions, self.solutions),
+                'risks_conditional': self.from_bits(sole_risks & pending, self.risks),
+                'solutions_conditional': self.from_bits(conditional_solutions, self.solutions)
+            })
+
+        impacts.sort(key=lambda impact: (
+            -len(impact['risks_removed']), -len(impact['solutions_removed']),
+            -len(impact['risks_conditional']), -len(impact['solutions_conditional'])
+        ))
+        return impacts
+
+    def build_quick_report(self, risk_bits: int) -> Dict[str, Any]:
+        solution_bits = self.solution_bits(risk_bits)
+        return {
+            'identified_risks': self.from_bits(risk_bits, self.risks),
+            'unique_solutions': self.from_bits(solution_bits, self.solutions),
+            'risk_summary': f"Analysis identified {risk_bits.bit_count()} risks with {solution_bits.bit_count()} possible solutions."
+        }
+
+    def build_detailed_report(self, risk_bits: int) -> Dict[str, Any]:
+        """Risks reference their solutions by ID; each solution's details appear
+        once in the top-level table, however many risks share it"""
+        identified_risks = [self.get_risk_entry(risk) for risk in self.from_bits(risk_bits, self.risks)]
+        solutions = {}
+        for entry in identified_risks:
+            for solution_id in entry['solution_ids']:
+                if solution_id not in solutions:
+                    solutions[solution_id] = self.get_solution_entry(solution_id)
+        return {
+            'identified_risks': identified_risks,
+            'solutions': solutions
+        }
+
+    def get_risk_entry(self, risk_type: str) -> Dict[str, Any]:
+        return report_fragments.get(
+            self.kb_version, ('risk_entry', risk_type),
+            lambda: self.build_risk_entry(risk_type)
+        )
+
+    def build_risk_entry(self, risk_type: str) -> Dict[str, Any]:
+        steps = self.get_mitigation_steps(risk_type)
+        return {
+            'risk_type': risk_type,
+            'mitigations': steps['mitigations'],
+            'solution_ids': [
+                str(self.solution_ids[name]) for name in steps['solution_details'] if name in self.solution_ids
+            ]
+        }
+
+    def get_solution_entry(self, solution_id: str) -> Dict[str, Any]:
+        name = self.solutions[int(solution_id)]
+        return report_fragments.get(
+            self.kb_version, ('solution_entry', name),
+            lambda: dict(self.get_solution_details(name), name=name)
+        )
+
+    def pack_answers(self, answers: Dict[str, str]) -> 'PackedAnswers':
+        """Pack a plain question -> answer dict, ignoring unknown questions"""
+        packed = PackedAnswers(self)
         for question, answer in answers.items():
-            if answer.lower() in ['no', 'n']:
-                question_data = self.survey_data[
-                    self.survey_data['Question'] == question
-                ]
-                if not question_data.empty and pd.notna(question_data.iloc[0]['Risk Present']):
-                    risks = question_data.iloc[0]['Risk Present'].split(',')
-                    identified_risks.update([risk.strip() for risk in risks])
-        return list(identified_risks)
+            if question in self.question_ids:
+                packed[question] = answer
+        return packed
+
+    def parse_mitigations(self, risk_row) -> Dict[str, List[str]]:
+        mitigations = {
+            'tech': [x.strip() for x in str(risk_row['Tech Mitigation']).split(',')] if notna(risk_row['Tech Mitigation']) else [],
+            'human': [x.strip() for x in str(risk_row['Human Mitigation']).split(',')] if notna(risk_row['Human Mitigation']) else [],
+            'tss': [x.strip() for x in str(risk_row['TSS Mitigation']).split(',')] if notna(risk_row['TSS Mitigation']) else [],
+            'analytics': [x.strip() for x in str(risk_row['Analytics Mitigation']).split(',')] if notna(risk_row['Analytics Mitigation']) else [],
+            'policy': [x.strip() for x in str(risk_row['Policy Mitigation']).split(',')] if notna(risk_row['Policy Mitigation']) else []
+        }
+        
+        for key in mitigations:
+            mitigations[key] = [item for item in mitigations[key] if item and item != 'nan']
+        return mitigations
+
+    def build_risk_solution_map(self) -> Dict[str, frozenset]:
+        """Map each risk type to every solution listed across its mitigation categories"""
+        risk_solutions = {}
+        for _, row in self.risk_matrix.iterrows():
+            if not notna(row['Risk Type']):
+                continue
+            solutions = set()
+            for category in self.parse_mitigations(row).values():
+                solutions.update(category)
+            risk_solutions.setdefault(str(row['Risk Type']).strip(), frozenset(solutions))
+        return risk_solutions
 
     def get_mitigation_steps(self, risk_type: str) -> Dict[str, Any]:
+        # Shared across reports; callers must not mutate the result
+        return report_fragments.get(
+            self.kb_version, ('mitigations', risk_type.strip()),
+            lambda: self.build_mitigation_steps(risk_type)
+        )
+
+    def build_mitigation_steps(self, risk_type: str) -> Dict[str, Any]:
         try:
             risk_data = self.risk_matrix[self.risk_matrix['Risk Type'].str.strip() == risk_type.strip()]
             
@@ -105,18 +394,7 @@ class DataProcessor:
                     'solution_details': {}
                 }
             
-            risk_row = risk_data.iloc[0]
-            
-            mitigations = {
-                'tech': [x.strip() for x in str(risk_row['Tech Mitigation']).split(',')] if pd.notna(risk_row['Tech Mitigation']) else [],
-                'human': [x.strip() for x in str(risk_row['Human Mitigation']).split(',')] if pd.notna(risk_row['Human Mitigation']) else [],
-                'tss': [x.strip() for x in str(risk_row['TSS Mitigation']).split(',')] if pd.notna(risk_row['TSS Mitigation']) else [],
-                'analytics': [x.strip() for x in str(risk_row['Analytics Mitigation']).split(',')] if pd.notna(risk_row['Analytics Mitigation']) else [],
-                'policy': [x.strip() for x in str(risk_row['Policy Mitigation']).split(',')] if pd.notna(risk_row['Policy Mitigation']) else []
-            }
-            
-            for key in mitigations:
-                mitigations[key] = [item for item in mitigations[key] if item and item != 'nan']
+            mitigations = self.parse_mitigations(risk_data.iloc[0])
             
             solution_details = {}
             all_mitigations = []
@@ -144,6 +422,12 @@ class DataProcessor:
             }
         
     def get_solution_details(self, solution_name: str) -> Dict[str, Any]:
+        return report_fragments.get(
+            self.kb_version, ('solution', solution_name),
+            lambda: self.build_solution_details(solution_name)
+        )
+
+    def build_solution_details(self, solution_name: str) -> Dict[str, Any]:
         try:
             solution_data = self.assurance_matrix[
                 self.assurance_matrix['Solution'] == solution_name
@@ -154,36 +438,86 @@ class DataProcessor:
                 
             data = solution_data.iloc[0]
             return {
-                'use_case': data['Use case'] if pd.notna(data['Use case']) else "",
-                'links': data['Links to use case'] if pd.notna(data['Links to use case']) else "",
-                'partners': data['Partner(s)'] if pd.notna(data['Partner(s)']) else "",
-                'data_format': data['Data Format'] if pd.notna(data['Data Format']) else "",
-                'immediate_actions': [x.strip() for x in str(data['Data type (Immediate Action)']).split(',')] if pd.notna(data['Data type (Immediate Action)']) else [],
-                'data_collation': [x.strip() for x in str(data['Data type (Data Collation)']).split(',')] if pd.notna(data['Data type (Data Collation)']) else [],
-                'dashboard': [x.strip() for x in str(data['Eco System outputs/results - Dashboard']).split(',')] if pd.notna(data['Eco System outputs/results - Dashboard']) else [],
-                'wearable': [x.strip() for x in str(data['Eco System outputs/results - Wearable']).split(',')] if pd.notna(data['Eco System outputs/results - Wearable']) else [],
-                'mobile': [x.strip() for x in str(data['Eco System outputs/results - Mobile']).split(',')] if pd.notna(data['Eco System outputs/results - Mobile']) else [],
-                'soc': [x.strip() for x in str(data['Eco System outputs/results - SOC']).split(',')] if pd.notna(data['Eco System outputs/results - SOC']) else [],
-                'audio_visual': [x.strip() for x in str(data['Eco System outputs/results - Audio/Visual']).split(',')] if pd.notna(data['Eco System outputs/results - Audio/Visual']) else []
+                'use_case': data['Use case'] if notna(data['Use case']) else "",
+                'links': data['Links to use case'] if notna(data['Links to use case']) else "",
+                'partners': data['Partner(s)'] if notna(data['Partner(s)']) else "",
+                'data_format': data['Data Format'] if notna(data['Data Format']) else "",
+                'immediate_actions': [x.strip() for x in str(data['Data type (Immediate Action)']).split(',')] if notna(data['Data type (Immediate Action)']) else [],
+                'data_collation': [x.strip() for x in str(data['Data type (Data Collation)']).split(',')] if notna(data['Data type (Data Collation)']) else [],
+                'dashboard': [x.strip() for x in str(data['Eco System outputs/results - Dashboard']).split(',')] if notna(data['Eco System outputs/results - Dashboard']) else [],
+                'wearable': [x.strip() for x in str(data['Eco System outputs/results - Wearable']).split(',')] if notna(data['Eco System outputs/results - Wearable']) else [],
+                'mobile': [x.strip() for x in str(data['Eco System outputs/results - Mobile']).split(',')] if notna(data['Eco System outputs/results - Mobile']) else [],
+                'soc': [x.strip() for x in str(data['Eco System outputs/results - SOC']).split(',')] if notna(data['Eco System outputs/results - SOC']) else [],
+                'audio_visual': [x.strip() for x in str(data['Eco System outputs/results - Audio/Visual']).split(',')] if notna(data['Eco System outputs/results - Audio/Visual']) else []
             }
         except Exception as e:
             print(f"Error getting solution details: {str(e)}")
             return None
 
+class PackedAnswers(MutableMapping):
+    """Survey answers packed as two bit arrays over interned question IDs.
+
+    A set bit in `answered` marks an answered question and the same bit in
+    `negative` marks a "No". Reads return "Yes"/"No", so the answers can be
+    used anywhere the old question -> answer dict was.
+    """
+    __slots__ = ('data_processor', 'answered', 'negative')
+
+    def __init__(self, data_processor):
+        self.data_processor = data_processor
+        self.answered = 0
+        self.negative = 0
+
+    def __setitem__(self, question, answer):
+        bit = 1 << self.data_processor.question_ids[question]
+        self.answered |= bit
+        if self.data_processor.is_negative(answer):
+            self.negative |= bit
+        else:
+            self.negative &= ~bit
+
+    def __getitem__(self, question):
+        idx = self.data_processor.question_ids.get(question)
+        if idx is None or not self.answered >> idx & 1:
+            raise KeyError(question)
+        return 'No' if self.negative >> idx & 1 else 'Yes'
+
+    def __delitem__(self, question):
+        if question not in self:
+            raise KeyError(question)
+        bit = 1 << self.data_processor.question_ids[question]
+        self.answered &= ~bit
+        self.negative &= ~bit
+
+    def __iter__(self):
+        return iter(self.data_processor.from_bits(self.answered, self.data_processor.questions))
+
+    def __len__(self):
+        return self.answered.bit_count()
+
 # Add this class after the DataProcessor class
 class AreaAnalysis:
     def __init__(self):
         # Load API key from environment variables
         self.google_api_key = os.getenv("GOOGLE_PLACES_API_KEY")
-        self.gmaps = googlemaps.Client(key=self.google_api_key) if self.google_api_key else None
-        self.geolocator = Nominatim(user_agent="security_assessment_app")
+        self._gmaps = None
+    
+    @property
+    def gmaps(self):
+        # Shared, rate-limited client that reuses connections across sessions
+        if self._gmaps is None and self.google_api_key:
+            import geo_clients
+            self._gmaps = geo_clients.get_places_client()
+        return self._gmaps
         
     def geocode_address(self, address, postcode):
         """Convert address to latitude and longitude"""
+        import geo_clients
+        
         try:
             # Combine address and postcode for better results
             full_address = f"{address}, {postcode}"
-            location = self.geolocator.geocode(full_address)
+            location = geo_clients.geocode(full_address)
             
             if location:
                 return {
@@ -193,7 +527,7 @@ class AreaAnalysis:
                 }
             else:
                 # Try just with postcode if full address fails
-                location = self.geolocator.geocode(postcode)
+                location = geo_clients.geocode(postcode)
                 if location:
                     return {
                         'lat': location.latitude,
@@ -210,38 +544,43 @@ class AreaAnalysis:
         """Find places of a specific type within radius (in meters)"""
         if not self.gmaps:
             return []
-            
+        
+        # Answer from the shared index, fetching only areas no earlier store covered
+        return place_index.query(
+            location, radius, place_type, keyword,
+            fetch=lambda lat, lng, fetch_radius: self.fetch_nearby_places(lat, lng, fetch_radius, place_type, keyword)
+        )
+    
+    def fetch_nearby_places(self, lat, lng, radius, place_type, keyword=None):
+        """Query Google Places directly; returns None on failure"""
+        import geo_clients
+        
         try:
             places_result = []
             params = {
-                'location': (location['lat'], location['lng']),
-                'radius': radius,
+                'location': (lat, lng),
+                'radius': int(math.ceil(radius)),
                 'type': place_type
             }
             
             if keyword:
                 params['keyword'] = keyword
                 
-            places = self.gmaps.places_nearby(**params)
+            places = geo_clients.places_nearby(self.gmaps, **params)
             
             if 'results' in places:
                 places_result.extend(places['results'])
                 
             # Handle pagination if there are more results
             while 'next_page_token' in places:
-                # Need to wait before requesting next page
-                time.sleep(2)
-                next_page_token = places['next_page_token']
-                places = self.gmaps.places_nearby(
-                    page_token=next_page_token
-                )
+                places = geo_clients.places_next_page(self.gmaps, places['next_page_token'])
                 if 'results' in places:
                     places_result.extend(places['results'])
             
             return places_result
         except Exception as e:
             print(f"Error finding nearby places: {str(e)}")
-            return []
+            return None
     
     def get_population_density(self, postcode):
         """Estimate population density based on available data"""
@@ -378,428 +717,348 @@ class StoreInformation:
     def is_complete(self):
         return self.current_field_idx >= len(self.store_fields)
 
-# PDF Report Generator
-class PDFReport:
-    def __init__(self):
-        self.elements = []
-        self.styles = getSampleStyleSheet()
-        
-        # Add custom styles
-        self.styles.add(ParagraphStyle(
-            name='CustomTitle',
-            parent=self.styles['Heading1'],
-            fontSize=16,
-            alignment=1,  # Center
-            textColor=colors.darkblue
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='Section',
-            parent=self.styles['Heading2'],
-            fontSize=12,
-            textColor=colors.black
-        ))
-        
-        self.styles.add(ParagraphStyle(
-            name='Content',
-            parent=self.styles['Normal'],
-            fontSize=10,
-            textColor=colors.black
-        ))
-    
-    def add_title(self, title):
-        self.elements.append(Paragraph(title, self.styles['CustomTitle']))
-        self.elements.append(Spacer(1, 12))
-    
-    def add_section(self, title):
-        self.elements.append(Paragraph(title, self.styles['Section']))
-        self.elements.append(Spacer(1, 6))
-    
-    def add_content(self, content):
-        self.elements.append(Paragraph(content, self.styles['Content']))
-        self.elements.append(Spacer(1, 3))
-    
-    def add_store_info(self, store_data):
-        self.add_section("Store Information")
-        for field, value in store_data.items():
-            self.add_content(f"<b>{field}:</b> {value}")
-    
-    def add_survey_responses(self, answers):
-        self.add_section("Survey Responses")
-        for question, answer in answers.items():
-            self.add_content(f"<b>Q:</b> {question}")
-            self.add_content(f"<b>A:</b> {answer}")
-            self.elements.append(Spacer(1, 3))
-    
-    def add_quick_report(self, report, store_data, answers):
-        self.add_store_info(store_data)
-        self.add_survey_responses(answers)
-        
-        self.add_section("Quick Analysis Summary")
-        self.add_content(report['risk_summary'])
-        
-        self.add_section("Identified Risks")
-        risks_text = ", ".join(report['identified_risks'])
-        self.add_content(risks_text)
-        
-        self.add_section("Available Solutions")
-        solutions_text = ", ".join(report['unique_solutions'])
-        self.add_content(solutions_text)
-    
-    def add_detailed_report(self, report, store_data, answers):
-        self.add_store_info(store_data)
-        self.add_survey_responses(answers)
-        
-        for risk_data in report['identified_risks']:
-            self.add_section(f"Risk: {risk_data['risk_type']}")
-            
-            mitigations = risk_data['mitigations']['mitigations']
-            solution_details = risk_data['mitigations']['solution_details']
-            
-            # Add Mitigations
-            self.add_section("Mitigation Steps")
-            for category, items in mitigations.items():
-                if items:
-                    category_text = f"<b>{category.title()}:</b> {', '.join(items)}"
-                    self.add_content(category_text)
-            
-            # Add Implementation Details
-            self.add_section("Implementation Details")
-            for solution_name, details in solution_details.items():
-                if details:
-                    self.add_content(f"<b>Solution: {solution_name}</b>")
-                    if details['use_case']:
-                        self.add_content(f"<b>Use Case:</b> {details['use_case']}")
-                    if details['links']:
-                        self.add_content(f"<b>Reference Links:</b> {details['links']}")
-                    if details['partners']:
-                        self.add_content(f"<b>Partners:</b> {details['partners']}")
-                    if details['data_format']:
-                        self.add_content(f"<b>Data Format:</b> {details['data_format']}")
-                    if details['immediate_actions']:
-                        self.add_content(f"<b>Immediate Actions:</b> {', '.join(details['immediate_actions'])}")
-                    if details['data_collation']:
-                        self.add_content(f"<b>Data Collation:</b> {', '.join(details['data_collation'])}")
-                    if details['dashboard']:
-                        self.add_content(f"<b>Dashboard Features:</b> {', '.join(details['dashboard'])}")
-                    if details['wearable']:
-                        self.add_content(f"<b>Wearable Features:</b> {', '.join(details['wearable'])}")
-                    if details['mobile']:
-                        self.add_content(f"<b>Mobile Features:</b> {', '.join(details['mobile'])}")
-                    if details['soc']:
-                        self.add_content(f"<b>SOC Features:</b> {', '.join(details['soc'])}")
-                    if details['audio_visual']:
-                        self.add_content(f"<b>Audio/Visual Features:</b> {', '.join(details['audio_visual'])}")
-                    self.elements.append(Spacer(1, 6))
-                    
-    def add_area_analysis_detailed(self, area_data):
-        """Add detailed area analysis to the PDF"""
-        if not area_data or not area_data.get('success', False):
-            self.add_section("Area Analysis")
-            self.add_content("Area analysis data not available.")
-            return
-            
-        self.add_section("AREA ANALYSIS")
-        
-        # Location info
-        if 'location' in area_data:
-            self.add_content(f"<b>Location:</b> {area_data['location'].get('formatted_address', 'Address not available')}")
-            
-        # Population info
-        if 'population' in area_data:
-            self.add_section("Population Demographics")
-            pop = area_data['population']
-            self.add_content(f"<b>Density:</b> {pop.get('density', 'Unknown')}")
-            self.add_content(f"<b>Estimated Population:</b> {pop.get('estimated_population', 'Unknown')}")
-            
-        # Student population
-        if 'student_population' in area_data:
-            students = area_data['student_population']
-            self.add_content(f"<b>Student Population:</b> {students.get('estimated_students', 'Unknown')}")
-            self.add_content(f"<b>Universities nearby:</b> {students.get('universities', 0)}")
-            self.add_content(f"<b>Colleges nearby:</b> {students.get('colleges', 0)}")
-        
-        # Schools
-        if 'schools' in area_data and area_data['schools']:
-            self.add_section("Educational Institutions Nearby")
-            for i, school in enumerate(area_data['schools'][:5], 1):  # Top 5 schools
-                self.add_content(f"{i}. <b>{school['name']}</b> - {school['vicinity']}")
-                
-        # Retail areas
-        if 'retail_areas' in area_data and area_data['retail_areas']:
-            self.add_section("Retail Areas Nearby")
-            for i, retail in enumerate(area_data['retail_areas'][:5], 1):  # Top 5 retail areas
-                self.add_content(f"{i}. <b>{retail['name']}</b> - {retail['vicinity']}")
-                
-        # Transport hubs
-        if 'transport' in area_data:
-            self.add_section("Transport Infrastructure")
-            
-            if area_data['transport']['train_stations']:
-                self.add_content("<b>Rail Stations:</b>")
-                for i, station in enumerate(area_data['transport']['train_stations'], 1):
-                    self.add_content(f"{i}. <b>{station['name']}</b> - {station['vicinity']}")
-                    
-            if area_data['transport']['bus_stations']:
-                self.add_content("<b>Bus Stations:</b>")
-                for i, station in enumerate(area_data['transport']['bus_stations'], 1):
-                    self.add_content(f"{i}. <b>{station['name']}</b> - {station['vicinity']}")
-                    
-        # Major junctions
-        if 'major_junctions' in area_data and area_data['major_junctions']:
-            self.add_section("Major Road Junctions")
-            for i, junction in enumerate(area_data['major_junctions'], 1):
-                self.add_content(f"{i}. <b>{junction['name']}</b> - {junction['vicinity']}")
-    
-    def add_area_analysis_quick(self, area_data):
-        """Add summarized area analysis to the quick PDF report"""
-        if not area_data or not area_data.get('success', False):
-            self.add_section("Area Analysis")
-            self.add_content("Area analysis data not available.")
-            return
-            
-        self.add_section("AREA ANALYSIS SUMMARY")
-        
-        # Location and Population Summary
-        if 'location' in area_data:
-            self.add_content(f"<b>Location:</b> {area_data['location'].get('formatted_address', 'Address not available')}")
-            
-        if 'population' in area_data:
-            self.add_content(f"<b>Population Density:</b> {area_data['population'].get('density', 'Unknown')}")
-            
-        # Count summaries
-        school_count = len(area_data.get('schools', []))
-        retail_count = len(area_data.get('retail_areas', []))
-        bus_count = len(area_data.get('transport', {}).get('bus_stations', []))
-        train_count = len(area_data.get('transport', {}).get('train_stations', []))
-        
-        self.add_content("<b>Nearby Points of Interest:</b>")
-        self.add_content(f"• <b>Schools:</b> {school_count}")
-        self.add_content(f"• <b>Retail Areas:</b> {retail_count}")
-        self.add_content(f"• <b>Train Stations:</b> {train_count}")
-        self.add_content(f"• <b>Bus Stations:</b> {bus_count}")
-        
-        if 'student_population' in area_data:
-            self.add_content(f"• <b>Student Population:</b> {area_data['student_population'].get('estimated_students', 'Unknown')}")
-    
-    def generate_pdf(self, filename):
-        """Generate PDF file with the given filename"""
-        try:
-            doc = SimpleDocTemplate(filename, pagesize=letter)
-            doc.build(self.elements)
-            return True
-        except Exception as e:
-            print(f"Error generating PDF: {str(e)}")
-            return False
-        
 # Risk Assessment Chat class
 class RiskAssessmentChat:
-    def __init__(self, session_id=None):
+    def __init__(self, session_id=None, kb_id=DEFAULT_KB_ID):
         self.session_id = session_id or str(uuid.uuid4())
-        self.data_processor = DataProcessor()
-        self.llm = ChatMistralAI(
-            mistral_api_key=MISTRAL_API_KEY,
-            model="mistral-large")
-        self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+        self.kb_id = kb_id
+        # Pinned for the session's lifetime; a reloaded workbook applies to new sessions
+        self.data_processor = knowledge_bases.get(kb_id)
+        self._agent_executor = None
         self.current_question_idx = 0
-        self.answers = {}
+        self.answers = PackedAnswers(self.data_processor)
+        # Risks flagged by the "No" bits and the solutions they call for
+        self.risk_bits = 0
+        self.solution_bits = 0
         self.store_info = StoreInformation()
-        self.setup_tools()
-        self.setup_agent()
         self.state = "store_info"
         self.messages = []
         self.area_analysis = AreaAnalysis()
         self.area_data = None
+        self.area_future = None
+        # Guards starting and clearing area_future across concurrent requests
+        self.area_lock = threading.Lock()
+        # Encoded /api/get_report bodies for the current report_etag()
+        self.report_cache = {}
+        # Epoch seconds; updated_at drives incremental analytics exports
+        self.created_at = time.time()
+        self.updated_at = self.created_at
 
-    def setup_tools(self):
-        self.risk_analyzer = RiskAnalyzerTool(data_processor=self.data_processor)
-        self.mitigation_tool = MitigationTool(data_processor=self.data_processor)
-        self.assurance_tool = AssuranceMetricsTool(data_processor=self.data_processor)
-        
-        self.tools = [self.risk_analyzer, self.mitigation_tool, self.assurance_tool]
-
-    def setup_agent(self):
-        prompt = PromptTemplate.from_template(
-            """You are a security risk assessment expert. Use the available tools to analyze risks 
-            and provide recommendations.
-
-            Current conversation:
-            {chat_history}
-
-            Human: {input}
-            Assistant: Let me help you with that analysis.
-
-            Available Tools:
-            {tools}
-
-            {agent_scratchpad}
-
-            Tool Names: {tool_names}
-            """
-        )
-
-        self.agent = create_react_agent(
-            llm=self.llm,
-            tools=self.tools,
-            prompt=prompt
-        )
-
-        self.agent_executor = AgentExecutor.from_agent_and_tools(
-            agent=self.agent,
-            tools=self.tools,
-            memory=self.memory,
-            verbose=True,
-            handle_parsing_errors=True
-        )
+    @property
+    def agent_executor(self):
+        """LLM agent over the risk tools, built on first use"""
+        if self._agent_executor is None:
+            from agent import build_agent_executor
+            self._agent_executor = build_agent_executor(self.data_processor)
+        return self._agent_executor
 
     def get_next_question(self):
-        if self.current_question_idx < len(self.data_processor.survey_data):
-            return self.data_processor.survey_data.iloc[self.current_question_idx]['Question']
-        return None
+        # Adaptive flow: skip questions that can no longer add a risk
+        return self.data_processor.select_next_question(self.answers.answered, self.risk_bits)
 
-    def process_answer(self, answer):
-        question = self.data_processor.survey_data.iloc[self.current_question_idx]['Question']
+    def process_answer(self, answer, question=None):
+        """Record the answer to the current question, or correct an earlier answer"""
+        if question is None:
+            question = self.get_next_question()
+        if question not in self.answers:
+            self.current_question_idx += 1
         self.answers[question] = answer
-        self.current_question_idx += 1
+        # Recomputing from the "No" bits also reverses a corrected answer
+        self.risk_bits = self.data_processor.risk_bits(self.answers.negative)
+        self.solution_bits = self.data_processor.solution_bits(self.risk_bits)
+        self.touch()
 
-    def generate_quick_report(self):
-        risks = self.data_processor.analyze_risks(self.answers)
-        unique_solutions = set()
-        unique_risks = set()
-        
-        report = {
-            'identified_risks': [],
-            'unique_solutions': [],
-            'risk_summary': ''
-        }
-        
-        for risk in risks:
-            unique_risks.add(risk)
-            risk_data = self.data_processor.get_mitigation_steps(risk)
-            for category in risk_data['mitigations'].values():
-                unique_solutions.update(category)
-        
-        report['identified_risks'] = list(unique_risks)
-        report['unique_solutions'] = list(unique_solutions)
-        report['risk_summary'] = f"Analysis identified {len(unique_risks)} risks with {len(unique_solutions)} possible solutions."
-        
-        return report
+    def touch(self):
+        self.updated_at = time.time()
 
-    def generate_detailed_report(self):
-        risks = self.data_processor.analyze_risks(self.answers)
-        report = {
-            'identified_risks': []
+    def get_quick_summary(self):
+        """Running risk and solution totals, kept current as answers arrive"""
+        risk_count = self.risk_bits.bit_count()
+        solution_count = self.solution_bits.bit_count()
+        return {
+            'risk_count': risk_count,
+            'solution_count': solution_count,
+            'risk_summary': f"Analysis identified {risk_count} risks with {solution_count} possible solutions."
         }
 
-        for risk in risks:
-            risk_data = {
-                'risk_type': risk,
-                'mitigations': self.data_processor.get_mitigation_steps(risk)
-            }
-            report['identified_risks'].append(risk_data)
+    def generate_quick_report(self):
+        return self.data_processor.build_quick_report(self.risk_bits)
+
+    def generate_detailed_report(self):
+        return self.data_processor.build_detailed_report(self.risk_bits)
 
-        return report
+    def what_if(self):
+        """Risks and solutions each "No" answer accounts for on its own, ranked by
+        impact; removals that skipped questions could undo are conditional"""
+        return {
+            'identified_risks': self.risk_bits.bit_count(),
+            'unique_solutions': self.solution_bits.bit_count(),
+            'answers': self.data_processor.answer_sensitivity(self.answers.answered, self.answers.negative)
+        }
     
-    def perform_area_analysis(self):
-        """Perform area analysis based on store information"""
-        if not self.store_info.store_data:
-            return None
+    def report_etag(self):
+        """Strong validator for the report payload, which depends only on the
+        answers, the store data, the knowledge base version and whether area
+        analysis has succeeded"""
+        digest = hashlib.sha256(self.data_processor.kb_version.encode())
+        area_ok = bool(self.area_data and self.area_data.get('success', False))
+        digest.update(f"{self.answers.answered:x}:{self.answers.negative:x}:{area_ok:d}".encode())
+        digest.update(orjson.dumps(self.store_info.store_data, option=orjson.OPT_SORT_KEYS))
+        return digest.hexdigest()[:32]
+    
+    def start_area_analysis(self):
+        """Start area analysis in the background once Address and Postcode are known"""
+        with self.area_lock:
+            if self.area_future is not None:
+                return self.area_future
+                
+            address = self.store_info.store_data.get('Address', '')
+            postcode = self.store_info.store_data.get('Postcode', '')
             
-        address = self.store_info.store_data.get('Address', '')
-        postcode = self.store_info.store_data.get('Postcode', '')
-        
-        if not address or not postcode:
+            if not address or not postcode:
+                return None
+                
+            self.area_future = area_executor.submit(self.area_analysis.analyze_area, address, postcode)
+            return self.area_future
+    
+    def perform_area_analysis(self, wait=True):
+        """Perform area analysis based on store information.
+
+        With wait=False an analysis still running is left to finish and the
+        current area data is returned; a failed one is retried in the background.
+        """
+        # Waits on the prefetch started during the store questions, if any
+        future = self.start_area_analysis()
+        if future is None:
             return None
+        if not wait and not future.done():
+            return self.area_data
             
-        self.area_data = self.area_analysis.analyze_area(address, postcode)
+        try:
+            area_data = future.result()
+        except Exception as e:
+            print(f"Error in area analysis: {str(e)}")
+            area_data = None
+        if not area_data or not area_data.get('success', False):
+            # Let the next report request retry, as it did before the prefetch
+            with self.area_lock:
+                if self.area_future is future:
+                    self.area_future = None
+            if area_data is None:
+                return None
+        if area_data is not self.area_data:
+            self.area_data = area_data
+            self.touch()
         return self.area_data
     
-    def generate_pdf_report(self, report_type="detailed"):
-        if report_type == "detailed":
-            report = self.generate_detailed_report()
-        else:
-            report = self.generate_quick_report()
-            
-        # Perform area analysis if not already done
-        if not self.area_data:
+    def build_pdf_payload(self, report_type="detailed"):
+        """Everything needed to render this session's PDF, in picklable form"""
+        # Perform area analysis if not already done, or retry a failed one
+        if not self.area_data or not self.area_data.get('success', False):
             self.perform_area_analysis()
             
-        pdf_generator = PDFReport()
-        pdf_generator.add_title("Security Risk Assessment Report")
-        pdf_generator.add_content(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        
-        if report_type == "detailed":
-            if self.area_data:
-                pdf_generator.add_area_analysis_detailed(self.area_data)
-            pdf_generator.add_detailed_report(report, self.store_info.store_data, self.answers)
-        else:
-            if self.area_data:
-                pdf_generator.add_area_analysis_quick(self.area_data)
-            pdf_generator.add_quick_report(report, self.store_info.store_data, self.answers)
-            
-        
+        return {
+            'name': self.session_id,
+            'report_type': report_type,
+            'report': self.generate_detailed_report() if report_type == "detailed" else self.generate_quick_report(),
+            'store_data': dict(self.store_info.store_data),
+            'answers': dict(self.answers),
+            'area_data': self.area_data,
+            'kb_version': self.data_processor.kb_version,
+            'generated_on': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        }
+    
+    def generate_pdf_report(self, report_type="detailed"):
         filename = f"security_assessment_{report_type}_{self.session_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
-        if pdf_generator.generate_pdf(filename):
+        if render_pdf(self.build_pdf_payload(report_type), filename):
             return filename
         return None
     
+def render_pdf(payload, output):
+    """Render a PDF payload to a filename or file-like object.
+
+    Module-level so bulk export can run it in worker processes.
+    """
+    from pdf_report import PDFReport
+    
+    pdf_generator = PDFReport()
+    pdf_generator.add_title("Security Risk Assessment Report")
+    pdf_generator.add_content(f"Generated on: {payload['generated_on']}")
+    
+    area_data = payload.get('area_data')
+    if payload['report_type'] == "detailed":
+        if area_data:
+            pdf_generator.add_area_analysis_detailed(area_data)
+        pdf_generator.add_detailed_report(payload['report'], payload['store_data'], payload['answers'], payload.get('kb_version'))
+    else:
+        if area_data:
+            pdf_generator.add_area_analysis_quick(area_data)
+        pdf_generator.add_quick_report(payload['report'], payload['store_data'], payload['answers'])
+    
+    return pdf_generator.generate_pdf(output)
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_BYTES = 1024
+
+def negotiate_encoding(req):
+    """Preferred response encoding the client accepts: br, gzip or identity"""
+    accepted = req.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return 'identity'
+
+def encode_body(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    return body
+
+def prewarm():
+    """Import the heavy subsystems on a background thread after boot, so neither
+    worker start-up nor the first request waits for them"""
+    def load():
+        try:
+            import pandas
+            import agent
+            import geo_clients
+            import pdf_report
+            get_portfolio()
+        except Exception as e:
+            print(f"Error prewarming dependencies: {str(e)}")
+    
+    thread = threading.Thread(target=load, name="prewarm", daemon=True)
+    thread.start()
+    return thread
+
 # Session storage
 sessions = {}
 
+# Background workers for area analysis prefetch
+area_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="area-analysis")
+
+# Compiled knowledge bases by ID, loaded on demand and shared by every session
+knowledge_bases = KnowledgeBaseRegistry(DataProcessor)
+
+# Estate-wide aggregates over completed assessments, per knowledge base
+portfolios = {}
+portfolio_lock = threading.Lock()
+
+def get_portfolio(kb_id=DEFAULT_KB_ID):
+    kb_id = kb_id or DEFAULT_KB_ID
+    data_processor = knowledge_bases.get(kb_id)
+    with portfolio_lock:
+        estate = portfolios.get(kb_id)
+        if estate is None:
+            estate = portfolios[kb_id] = PortfolioAnalysis(data_processor)
+        # Follow reloads of the workbook for raw assessments; sessions are
+        # summarised with the version they were answered against
+        estate.data_processor = data_processor
+    return estate
+
 # Helper function to get or create session
-def get_session(session_id=None):
+def get_session(session_id=None, kb_id=DEFAULT_KB_ID):
     if session_id and session_id in sessions:
         return sessions[session_id]
     
     # Create new session
-    new_session = RiskAssessmentChat(session_id)
+    new_session = RiskAssessmentChat(session_id, kb_id)
     session_id = new_session.session_id
     sessions[session_id] = new_session
     return new_session
 
+WELCOME_MESSAGE = "Welcome to the Security Risk Assessment. Let's start by collecting some information about your store. what's your store name"
+
 @app.route('/api/start_session', methods=['POST'])
 def start_session():
-    session = get_session()
+    kb_id = (request.get_json(silent=True) or {}).get('kb_id') or DEFAULT_KB_ID
+    try:
+        session = get_session(kb_id=kb_id)
+    except UnknownKnowledgeBase:
+        return jsonify({'error': f'Unknown knowledge base: {kb_id}'}), 404
     return jsonify({
         'session_id': session.session_id,
+        'kb_id': session.kb_id,
         'state': session.state,
-        'message': "Welcome to the Security Risk Assessment. Let's start by collecting some information about your store. what's your store name"
+        'message': WELCOME_MESSAGE
     })
 
 @app.route('/api/message', methods=['POST'])
 def handle_message():
-    data = request.json
+    reply, status = reply_to_message(request.json)
+    return jsonify(reply), status
+
+def reply_to_message(data):
+    """Advance a session's conversation by one message; shared with the ASGI app"""
     session_id = data.get('session_id')
     user_message = data.get('message')
     
     if not session_id or not user_message:
-        return jsonify({'error': 'Missing session_id or message'}), 400
+        return {'error': 'Missing session_id or message'}, 400
+    if not isinstance(user_message, str):
+        return {'error': 'message must be a string'}, 400
     
     session = get_session(session_id)
     
+    # Correct an earlier survey answer; the running risk set is updated in place
+    corrected_question = data.get('question')
+    if corrected_question is not None:
+        if corrected_question not in session.answers:
+            return {'error': 'Can only correct a question that has been answered'}, 400
+        if user_message.upper() not in ['Y', 'N', 'YES', 'NO']:
+            return {
+                'session_id': session_id,
+                'state': session.state,
+                'message': "Please answer with Y or N",
+                'error': True
+            }, 200
+        
+        session.process_answer(user_message, question=corrected_question)
+        next_question = session.get_next_question()
+        # A changed answer can make a previously skipped question relevant again
+        session.state = "survey" if next_question else "report"
+        session.touch()
+        if session.state == "report":
+            get_portfolio(session.kb_id).ingest_session(session)
+        else:
+            # A reopened survey no longer counts towards the estate
+            get_portfolio(session.kb_id).remove(session.session_id)
+        message = f"Answer updated.\n\n**Survey Question**: {next_question}" if next_question else "Answer updated. Your analysis has been refreshed."
+        return {
+            'session_id': session_id,
+            'state': session.state,
+            'message': message,
+            'progress': session.get_quick_summary()
+        }, 200
+    
     # Process message based on the current state
     if session.state == "store_info":
         field_info = session.store_info.get_next_question()
         
         if field_info:
             session.store_info.process_answer(user_message)
+            session.touch()
+            # Hide geocoding and Places latency behind the rest of the survey
+            session.start_area_analysis()
             
             if session.store_info.is_complete():
                 session.state = "survey"
                 next_question = session.get_next_question()
-                return jsonify({
+                return {
                     'session_id': session_id,
                     'state': session.state,
                     'message': f"Store information complete. Now let's begin the survey.\n\n**Survey Question**: {next_question}"
-                })
+                }, 200
             else:
                 # Get the next store info question
                 next_field = session.store_info.get_next_question()
-                return jsonify({
+                return {
                     'session_id': session_id,
                     'state': session.state,
                     'message': next_field['question']
-                })
+                }, 200
         
     elif session.state == "survey":
         question = session.get_next_question()
@@ -807,44 +1066,48 @@ def handle_message():
         if question:
             # Validate Y/N answer
             if user_message.upper() not in ['Y', 'N', 'YES', 'NO']:
-                return jsonify({
+                return {
                     'session_id': session_id,
                     'state': session.state,
                     'message': "Please answer with Y or N",
                     'error': True
-                })
+                }, 200
             
             session.process_answer(user_message)
             next_question = session.get_next_question()
             
             if next_question:
-                return jsonify({
+                return {
                     'session_id': session_id,
                     'state': session.state,
-                    'message': f"**Survey Question**: {next_question}"
-                })
+                    'message': f"**Survey Question**: {next_question}",
+                    'progress': session.get_quick_summary()
+                }, 200
             else:
                 session.state = "report"
-                return jsonify({
+                session.touch()
+                get_portfolio(session.kb_id).ingest_session(session)
+                return {
                     'session_id': session_id,
                     'state': session.state,
-                    'message': "Survey complete! Generating analysis..."
-                })
+                    'message': "Survey complete! Generating analysis...",
+                    'progress': session.get_quick_summary()
+                }, 200
         
     elif session.state == "report":
         # This handles any messages after the report is complete
-        return jsonify({
+        return {
             'session_id': session_id,
             'state': session.state,
             'message': "Your security assessment is complete. You can download the reports using the links provided."
-        })
+        }, 200
     
     # Default response if none of the conditions are met
-    return jsonify({
+    return {
         'session_id': session_id,
         'state': session.state,
         'message': "I didn't understand that. Please try again."
-    })
+    }, 200
 
 # Update the get_report_status endpoint
 @app.route('/api/get_report', methods=['GET'])
@@ -862,20 +1125,94 @@ def get_report_status():
             'message': "The survey is not yet complete."
         })
     
-    # Generate the reports data
-    quick_report = session.generate_quick_report()
-    detailed_report = session.generate_detailed_report()
+    return report_response(session, request)
+
+def report_response(session, req, response_class=Response):
+    """The session's report as a conditional, compressed response to req.
+
+    The payload only changes with the answers, store data, knowledge base or
+    area analysis outcome, so a client holding the current version gets a 304
+    without any work.
+    """
+    not_modified = report_not_modified(session, req, response_class)
+    if not_modified is not None:
+        return not_modified
     
-    # Perform area analysis
+    # The body needs the area analysis, so wait for it (or its retry) here
     area_data = session.perform_area_analysis()
+    etag = session.report_etag()
+    representations = report_representations(etag)
+    encoding = negotiate_encoding(req)
     
-    return jsonify({
-        'ready': True,
-        'quick_report': quick_report,
-        'detailed_report': detailed_report,
-        'area_analysis': area_data if area_data and area_data.get('success', False) else None
-    })
+    cache = session.report_cache
+    if cache.get('etag') != etag:
+        # Generate the reports data
+        quick_report = session.generate_quick_report()
+        detailed_report = session.generate_detailed_report()
+        
+        get_portfolio(session.kb_id).ingest_session(session)
+        
+        body = orjson.dumps({
+            'ready': True,
+            'quick_report': quick_report,
+            'detailed_report': detailed_report,
+            'area_analysis': area_data if area_data and area_data.get('success', False) else None
+        }, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+        cache = {'etag': etag, 'identity': body}
+        session.report_cache = cache
+    
+    if len(cache['identity']) < COMPRESS_MIN_BYTES:
+        encoding = 'identity'
+    if encoding not in cache:
+        cache[encoding] = encode_body(cache['identity'], encoding)
+    
+    response = response_class(cache[encoding], mimetype='application/json')
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    # Each encoding is a separate representation with its own strong ETag
+    response.set_etag(representations[encoding])
+    return report_headers(response)
+
+def report_representations(etag):
+    """Encoding -> strong ETag; each encoding is a separate representation"""
+    representations = {name: f"{etag}-{name}" for name in ['gzip', 'br']}
+    representations['identity'] = etag
+    return representations
+
+def report_not_modified(session, req, response_class=Response):
+    """A 304 if req already holds the current report, else None.
 
+    The validator is taken from the area analysis as it stands, without
+    waiting on it; a failed one is retried in the background, and its success
+    changes the ETag for a later request.
+    """
+    session.perform_area_analysis(wait=False)
+    representations = report_representations(session.report_etag())
+    matched = [tag for tag in representations.values() if req.if_none_match.contains(tag)]
+    if not matched:
+        return None
+    response = response_class(status=304)
+    response.set_etag(matched[0])
+    return report_headers(response)
+
+def report_headers(response):
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/api/what_if', methods=['GET'])
+def what_if():
+    session_id = request.args.get('session_id')
+    
+    if not session_id or session_id not in sessions:
+        return jsonify({'error': 'Invalid session_id'}), 400
+    
+    session = sessions[session_id]
+    
+    if session.state != "report":
+        return jsonify({'error': 'The survey is not yet complete'}), 400
+    
+    return jsonify(session.what_if())
 
 @app.route('/api/download_report', methods=['GET'])
 def download_report():
@@ -903,6 +1240,68 @@ def download_report():
         download_name=f"security_assessment_{report_type}.pdf"
     )
 
+@app.route('/api/bulk_export', methods=['POST'])
+def bulk_export_reports():
+    """Render PDFs for many sessions or batch assessments, streamed as one ZIP"""
+    data = request.json or {}
+    report_type = data.get('type', 'detailed')  # 'detailed' or 'quick'
+    
+    if report_type not in ['detailed', 'quick']:
+        return jsonify({'error': 'Invalid report type'}), 400
+    
+    if 'assessments' in data:
+        try:
+            data_processor = knowledge_bases.get(data.get('kb_id'))
+        except UnknownKnowledgeBase:
+            return jsonify({'error': f"Unknown knowledge base: {data.get('kb_id')}"}), 404
+        # Checked up front: once the ZIP starts streaming, an error can only truncate it
+        error = assessment_error(data['assessments'], data_processor.question_ids)
+        if error:
+            return jsonify({'error': error}), 400
+        payloads = bulk_export.assessment_payloads(data_processor, data['assessments'], report_type)
+    else:
+        session_ids = data.get('session_ids', [])
+        if not session_ids:
+            return jsonify({'error': 'Missing session_ids or assessments'}), 400
+        
+        invalid = [sid for sid in session_ids if sid not in sessions or sessions[sid].state != "report"]
+        if invalid:
+            return jsonify({'error': 'Invalid or incomplete sessions', 'session_ids': invalid}), 400
+        
+        payloads = (sessions[sid].build_pdf_payload(report_type) for sid in session_ids)
+    
+    return Response(
+        bulk_export.stream_zip(payloads, bulk_export.get_pool(), os.cpu_count()),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename=security_assessments_{report_type}.zip'}
+    )
+
+@app.route('/api/export', methods=['GET'])
+def export_assessments():
+    """Stream every session's assessment data as NDJSON or Parquet for analytics"""
+    export_format = request.args.get('format', 'ndjson')
+    
+    if export_format not in analytics_export.FORMATS:
+        return jsonify({'error': f"Invalid format; expected one of {', '.join(analytics_export.FORMATS)}"}), 400
+    
+    try:
+        since = analytics_export.parse_since(request.args.get('since'))
+    except ValueError:
+        return jsonify({'error': 'Invalid since timestamp'}), 400
+    
+    # Taken before any session is read, so the next export starting from it
+    # cannot miss an update (it may repeat sessions updated during this one)
+    watermark = time.time()
+    
+    return Response(
+        analytics_export.export_stream(sessions, export_format, since),
+        mimetype=analytics_export.FORMATS[export_format],
+        headers={
+            'Content-Disposition': f'attachment; filename=assessments.{export_format}',
+            'X-Export-Watermark': analytics_export.isoformat(watermark)
+        }
+    )
+
 # Clean up old PDF files (could be implemented as a scheduled task)
 @app.route('/api/cleanup', methods=['POST'])
 def cleanup_files():
@@ -927,5 +1326,87 @@ def status():
         'session_ids': list(sessions.keys())
     })
 
+@app.route('/api/knowledge_bases', methods=['GET'])
+def list_knowledge_bases():
+    return jsonify({
+        'available': knowledge_bases.available(),
+        'loaded': knowledge_bases.loaded()
+    })
+
+@app.route('/api/knowledge_bases/<kb_id>/reload', methods=['POST'])
+def reload_knowledge_base(kb_id):
+    """Recompile a client's workbook after an update; sessions in progress keep the old version"""
+    try:
+        data_processor = knowledge_bases.reload(kb_id)
+    except UnknownKnowledgeBase:
+        return jsonify({'error': f'Unknown knowledge base: {kb_id}'}), 404
+    return jsonify({'kb_id': kb_id, 'kb_version': data_processor.kb_version})
+
+# Portfolio endpoints
+@app.route('/api/portfolio/ingest', methods=['POST'])
+def portfolio_ingest():
+    """Load completed assessments from other deployments or historical exports"""
+    data = request.json or {}
+    assessments = data.get('assessments', [])
+    
+    try:
+        estate = get_portfolio(data.get('kb_id'))
+    except UnknownKnowledgeBase:
+        return jsonify({'error': f"Unknown knowledge base: {data.get('kb_id')}"}), 404
+    
+    error = assessment_error(assessments, estate.data_processor.question_ids)
+    if error:
+        return jsonify({'error': error}), 400
+    for assessment in assessments:
+        estate.ingest(
+            assessment['id'],
+            assessment.get('store_data', {}),
+            assessment['answers'],
+            assessment.get('area_data')
+        )
+    
+    return jsonify({
+        'ingested': len(assessments),
+        'total_stores': len(estate.assessments)
+    })
+
+def group_by_fields() -> Optional[List[str]]:
+    """?group_by as a list of fields; None when absent, [] (whole estate) when empty"""
+    group_by = request.args.get('group_by')
+    if group_by is None:
+        return None
+    return [field.strip() for field in group_by.split(',') if field.strip()]
+
+@app.route('/api/portfolio/heatmap', methods=['GET'])
+def portfolio_heatmap():
+    try:
+        return jsonify(get_portfolio(request.args.get('kb_id')).risk_heatmap(group_by_fields()))
+    except UnknownKnowledgeBase:
+        return jsonify({'error': f"Unknown knowledge base: {request.args.get('kb_id')}"}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/portfolio/solutions', methods=['GET'])
+def portfolio_solutions():
+    try:
+        return jsonify(get_portfolio(request.args.get('kb_id')).solution_demand(group_by_fields()))
+    except UnknownKnowledgeBase:
+        return jsonify({'error': f"Unknown knowledge base: {request.args.get('kb_id')}"}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+# Adaptive survey statistics for the loaded question sheet
+@app.route('/api/survey_plan', methods=['GET'])
+def survey_plan():
+    p_no = request.args.get('p_no', 0.5, type=float)
+    if not 0.0 <= p_no <= 1.0:  # also rejects nan
+        return jsonify({'error': 'p_no must be a probability between 0 and 1'}), 400
+    try:
+        data_processor = knowledge_bases.get(request.args.get('kb_id'))
+    except UnknownKnowledgeBase:
+        return jsonify({'error': f"Unknown knowledge base: {request.args.get('kb_id')}"}), 404
+    return jsonify(data_processor.expected_question_savings(p_no))
+
 if __name__ == '__main__':
+    prewarm()
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
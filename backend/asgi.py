@@ -0,0 +1,144 @@
+"""ASGI serving mode for the survey API.
+
+The survey routes are async Quart views over the same sessions and logic as
+the Flask app. A request waiting on area analysis awaits it on the event loop
+instead of holding a worker thread. Report building runs on a thread, and PDF
+rendering, which is CPU-bound, runs in the bulk export process pool. Every
+other route is served by the Flask app through a WSGI adapter.
+
+Usage (from backend/):
+    uvicorn asgi:application --host 0.0.0.0 --port 5000
+"""
+import asyncio
+
+from a2wsgi import WSGIMiddleware
+from quart import Quart, Response, abort, jsonify, request
+from quart_cors import cors
+
+import bulk_export
+from app import (DEFAULT_KB_ID, WELCOME_MESSAGE, UnknownKnowledgeBase, get_session, prewarm, reply_to_message,
+                 report_not_modified, report_response, sessions)
+from app import app as flask_app
+
+app = Quart(__name__)
+# Allow any origin and echo it back, as flask_cors does by default; the
+# keyword argument cannot turn the wildcard off, so it is set in config
+app.config['QUART_CORS_SEND_ORIGIN_WILDCARD'] = False
+app = cors(app, allow_origin="*")
+
+# Served by the async views; everything else goes to the Flask app
+ASYNC_PATHS = {'/api/start_session', '/api/message', '/api/get_report', '/api/download_report', '/api/status'}
+
+wsgi_app = WSGIMiddleware(flask_app)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] not in ASYNC_PATHS:
+        return await wsgi_app(scope, receive, send)
+    return await app(scope, receive, send)
+
+
+@app.before_serving
+async def startup():
+    prewarm()
+
+
+async def area_analysis(session):
+    """Wait for the session's area analysis without holding a thread; errors
+    are reported when perform_area_analysis() collects the result"""
+    future = session.start_area_analysis()
+    if future is not None:
+        await asyncio.wait([asyncio.wrap_future(future)])
+
+
+@app.route('/api/start_session', methods=['POST'])
+async def start_session():
+    kb_id = ((await request.get_json(silent=True)) or {}).get('kb_id') or DEFAULT_KB_ID
+    try:
+        # A knowledge base not yet loaded is compiled from its workbook
+        session = await asyncio.to_thread(get_session, None, kb_id)
+    except UnknownKnowledgeBase:
+        return jsonify({'error': f'Unknown knowledge base: {kb_id}'}), 404
+    return jsonify({
+        'session_id': session.session_id,
+        'kb_id': session.kb_id,
+        'state': session.state,
+        'message': WELCOME_MESSAGE
+    })
+
+
+@app.route('/api/message', methods=['POST'])
+async def handle_message():
+    data = await request.get_json()
+    if data is None:
+        abort(415)
+    # Off the event loop: a session's first message can compile its knowledge
+    # base, and a finished survey is ingested into the portfolio
+    reply, status = await asyncio.to_thread(reply_to_message, data)
+    return jsonify(reply), status
+
+
+@app.route('/api/get_report', methods=['GET'])
+async def get_report_status():
+    session_id = request.args.get('session_id')
+
+    if not session_id or session_id not in sessions:
+        return jsonify({'error': 'Invalid session_id'}), 400
+
+    session = sessions[session_id]
+
+    if session.state != "report":
+        return jsonify({
+            'ready': False,
+            'message': "The survey is not yet complete."
+        })
+
+    # A client holding the current report gets its 304 without waiting on area analysis
+    not_modified = report_not_modified(session, request, Response)
+    if not_modified is not None:
+        return not_modified
+    await area_analysis(session)
+    return await asyncio.to_thread(report_response, session, request, Response)
+
+
+@app.route('/api/download_report', methods=['GET'])
+async def download_report():
+    session_id = request.args.get('session_id')
+    report_type = request.args.get('type', 'detailed')  # 'detailed' or 'quick'
+
+    if not session_id or session_id not in sessions:
+        return jsonify({'error': 'Invalid session_id'}), 400
+
+    session = sessions[session_id]
+
+    if session.state != "report":
+        return jsonify({'error': 'The survey is not yet complete'}), 400
+
+    await area_analysis(session)
+    payload = await asyncio.to_thread(session.build_pdf_payload, report_type)
+    try:
+        _, pdf = await asyncio.get_running_loop().run_in_executor(
+            bulk_export.get_pool(), bulk_export.render_payload, payload
+        )
+    except Exception as e:
+        print(f"Error generating PDF report: {str(e)}")
+        return jsonify({'error': 'Failed to generate PDF report'}), 500
+
+    return Response(pdf, mimetype='application/pdf', headers={
+        'Content-Disposition': f'attachment; filename=security_assessment_{report_type}.pdf'
+    })
+
+
+@app.route('/api/status', methods=['GET'])
+async def status():
+    return jsonify({
+        'status': 'running',
+        'active_sessions': len(sessions),
+        'session_ids': list(sessions.keys())
+    })
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    uvicorn.run(application, host='0.0.0.0', port=5000)
@@ -0,0 +1,107 @@
+"""Recall/latency benchmark of the support chatbot's FAISS index options.
+
+Every configuration is compared against the exact flat index on the same
+vectors: recall@k, per-query latency, build time and index size.
+
+By default the corpus is synthetic clustered unit vectors shaped like
+all-MiniLM-L6-v2 embeddings. Pass --vectors with a float32 .npy file to
+benchmark real embeddings instead.
+
+Usage (from backend/):
+    python benchmarks/ann_recall.py [--n 200000] [--queries 500] [--k 5] [--vectors emb.npy]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import EMBEDDING_DIM, create_index, index_spec  # noqa: E402
+
+CONFIGURATIONS = [
+    ("flat", "none"),
+    ("flat", "sq8"),
+    ("hnsw", "none"),
+    ("hnsw", "sq8"),
+    ("ivf", "none"),
+    ("ivf", "sq8"),
+    ("ivf", "pq"),
+]
+
+
+def synthetic_vectors(n, dim, clusters=256, seed=0):
+    """Unit vectors around random topic centres, like sentence embeddings"""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype("float32")
+    vectors = centres[rng.integers(clusters, size=n)] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def measure(index, queries, k):
+    latencies = []
+    results = np.empty((len(queries), k), dtype="int64")
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[i] = ids[0]
+    return results, latencies
+
+
+def recall(results, truth):
+    hits = sum(len(set(found) & set(expected)) for found, expected in zip(results, truth))
+    return hits / truth.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=200_000, help="synthetic corpus size")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5, help="neighbours per query (the retriever uses 5)")
+    parser.add_argument("--vectors", help="float32 .npy file of real embeddings")
+    args = parser.parse_args()
+
+    if args.vectors:
+        vectors = np.ascontiguousarray(np.load(args.vectors), dtype="float32")
+    else:
+        vectors = synthetic_vectors(args.n, EMBEDDING_DIM)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), args.queries, replace=False)]
+    queries = queries + 0.05 * rng.standard_normal(queries.shape).astype("float32")
+    dim = vectors.shape[1]
+
+    print(f"{len(vectors)} vectors x {dim} dims, {args.queries} queries, recall@{args.k}")
+    print(f"auto choice: {index_spec(len(vectors), 'auto', None, dim)}")
+    print(f"{'index':<22}{'recall':>8}{'p50 ms':>9}{'p95 ms':>9}{'build s':>9}{'size MB':>9}")
+
+    truth = None
+    seen = set()
+    for index_type, quantization in CONFIGURATIONS:
+        spec = index_spec(len(vectors), index_type, quantization, dim)
+        if spec in seen:
+            continue
+        seen.add(spec)
+
+        start = time.perf_counter()
+        index = create_index(spec, vectors, dim)
+        index.add(vectors)
+        build_time = time.perf_counter() - start
+
+        results, latencies = measure(index, queries, args.k)
+        if truth is None:
+            # The first configuration is the exact flat baseline
+            truth = results
+        size_mb = faiss.serialize_index(index).nbytes / 1e6
+        p95 = statistics.quantiles(latencies, n=20)[-1]
+        print(f"{spec:<22}{recall(results, truth):>8.3f}{statistics.median(latencies):>9.3f}"
+              f"{p95:>9.3f}{build_time:>9.1f}{size_mb:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Parity and concurrency checks of the ASGI serving mode against the Flask app.
+
+Parity: the same conversations are driven through the Flask test client and
+through asgi.application, and the status codes, JSON bodies (session IDs
+aside), report headers, 304s and PDF downloads are compared. A route left on
+Flask is also checked through the dispatcher.
+
+Load: --sessions concurrent sessions run a whole survey and then fetch their
+report from the ASGI app on one event loop, and the run reports latency and
+peak thread count. Area analysis is replaced by a fake with --area-latency
+seconds of I/O, so no geocoding or Places calls are made.
+
+--check runs the parity pass alone with instant fake area analysis, and exits
+non-zero on any difference, so it can be run after every change to either app.
+
+Usage (from backend/):
+    python benchmarks/asgi_parity.py [--sessions 300] [--area-latency 0.2]
+    python benchmarks/asgi_parity.py --check
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+
+import app as survey  # noqa: E402
+from asgi import application  # noqa: E402
+
+# Requests come from the frontend's origin, as a browser sends them
+ORIGIN = {'Origin': "http://localhost:3000"}
+
+STORE_ANSWERS = ["Parity Store", "P-1", "1 High Street", "AB1 2CD", "Superstore", "High street", "60", "4",
+                 "Yes", "Spirits", "Yes", "TTW", "No", "No"]
+
+
+def fake_area_analysis(latency):
+    def analyze_area(self, address, postcode):
+        time.sleep(latency)
+        return {
+            'success': True,
+            'location': {'lat': 51.5, 'lng': -0.12, 'formatted_address': f"{address}, {postcode}"},
+            'schools': [{'name': 'School', 'vicinity': 'Church Lane'}],
+            'retail_areas': [],
+            'transport': {'bus_stations': [{'name': 'Stop', 'vicinity': 'High Street'}], 'train_stations': []},
+            'major_junctions': [],
+            'population': {'density': 'High', 'estimated_population': 12000}
+        }
+    return analyze_area
+
+
+def without_ids(body, session_ids):
+    """JSON body with session IDs blanked, for comparison across the two apps"""
+    if isinstance(body, dict):
+        return {key: without_ids(value, session_ids) for key, value in body.items()}
+    if isinstance(body, list):
+        return [without_ids(value, session_ids) for value in body]
+    return "<session>" if body in session_ids else body
+
+
+def conversation(answers):
+    """(method, path, payload builder) steps of one survey, with error cases"""
+    steps = [
+        ("POST", "/api/message", lambda sid: {'session_id': sid}),
+        ("GET", "/api/get_report", lambda sid: {'session_id': sid}),
+        ("GET", "/api/get_report", lambda sid: {}),
+    ]
+    steps += [("POST", "/api/message", lambda sid, a=a: {'session_id': sid, 'message': a}) for a in STORE_ANSWERS]
+    steps.append(("POST", "/api/message", lambda sid: {'session_id': sid, 'message': "maybe"}))
+    steps += [("POST", "/api/message", lambda sid, a=a: {'session_id': sid, 'message': a}) for a in answers]
+    steps += [
+        ("POST", "/api/message", lambda sid: {'session_id': sid, 'message': "anything else?"}),
+        ("GET", "/api/download_report", lambda sid: {'session_id': "missing"}),
+    ]
+    return steps
+
+
+class FlaskSide:
+    def __init__(self):
+        self.client = survey.app.test_client()
+
+    async def request(self, method, path, payload=None, headers=None):
+        headers = dict(ORIGIN, **(headers or {}))
+        if method == "POST":
+            response = self.client.post(path, json=payload, headers=headers)
+        else:
+            response = self.client.get(path, query_string=payload, headers=headers)
+        return response.status_code, response.headers, response.get_data()
+
+
+class AsgiSide:
+    def __init__(self):
+        # Ask for identity bodies unless a step says otherwise, as the Flask test client does
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=application), base_url="http://asgi",
+                                        headers=dict(ORIGIN, **{'Accept-Encoding': 'identity'}))
+
+    async def request(self, method, path, payload=None, headers=None):
+        if method == "POST":
+            response = await self.client.post(path, json=payload, headers=headers)
+        else:
+            response = await self.client.get(path, params=payload, headers=headers)
+        return response.status_code, response.headers, response.content
+
+
+async def raw_get(side, path, params, headers):
+    """GET without transparent decompression, so encoded bodies compare byte for byte"""
+    if isinstance(side, FlaskSide):
+        return await side.request("GET", path, params, headers)
+    response = await side.client.send(side.client.build_request("GET", path, params=params, headers=headers),
+                                      stream=True)
+    body = b"".join([chunk async for chunk in response.aiter_raw()])
+    await response.aclose()
+    return response.status_code, response.headers, body
+
+
+def header(headers, name):
+    """Tokens of a header across all its lines; flask_cors adds Vary: Origin as a line of its own"""
+    lines = headers.getlist(name) if hasattr(headers, 'getlist') else headers.get_list(name)
+    return sorted(token.strip() for line in lines for token in line.split(','))
+
+
+def compare(step, flask_result, asgi_result, session_ids, failures):
+    (f_status, f_headers, f_body), (a_status, a_headers, a_body) = flask_result, asgi_result
+    if f_status != a_status:
+        failures.append(f"{step}: status {f_status} != {a_status}")
+        return
+    if f_headers.get('Content-Type', '').startswith('application/json') and f_body:
+        f_json = without_ids(json.loads(f_body), session_ids)
+        a_json = without_ids(json.loads(a_body), session_ids)
+        if f_json != a_json:
+            failures.append(f"{step}: body {f_json} != {a_json}")
+    for name in ('Content-Encoding', 'Cache-Control', 'Vary', 'Access-Control-Allow-Origin'):
+        if header(f_headers, name) != header(a_headers, name):
+            failures.append(f"{step}: {name} {header(f_headers, name)} != {header(a_headers, name)}")
+
+
+async def check_parity(answers):
+    flask_side, asgi_side = FlaskSide(), AsgiSide()
+    failures = []
+
+    for kb_payload in ({}, {'kb_id': 'no-such-kb'}):
+        results = [await side.request("POST", "/api/start_session", kb_payload) for side in (flask_side, asgi_side)]
+        compare(f"start_session {kb_payload}", *results, set(survey.sessions), failures)
+
+    sids = []
+    for side in (flask_side, asgi_side):
+        _, _, body = await side.request("POST", "/api/start_session", {})
+        sids.append(json.loads(body)['session_id'])
+    session_ids = set(survey.sessions)
+
+    for step, (method, path, build) in enumerate(conversation(answers)):
+        results = [await side.request(method, path, build(sid)) for side, sid in zip((flask_side, asgi_side), sids)]
+        compare(f"step {step} {path}", *results, session_ids, failures)
+
+    # Correct the first answer, then fetch the report in every encoding and revalidate it
+    question = survey.sessions[sids[0]].data_processor.questions[0]
+    results = [await side.request("POST", "/api/message", {'session_id': sid, 'message': "Y", 'question': question})
+               for side, sid in zip((flask_side, asgi_side), sids)]
+    compare("correction", *results, session_ids, failures)
+    # A "Yes" can reopen skipped questions; finish the survey again
+    for step, answer in enumerate(answers):
+        results = [await side.request("POST", "/api/message", {'session_id': sid, 'message': answer})
+                   for side, sid in zip((flask_side, asgi_side), sids)]
+        compare(f"after correction {step}", *results, session_ids, failures)
+
+    for encoding in ('identity', 'gzip', 'br'):
+        headers = {'Accept-Encoding': encoding}
+        results = [await raw_get(side, "/api/get_report", {'session_id': sid}, headers)
+                   for side, sid in zip((flask_side, asgi_side), sids)]
+        if results[0][2] != results[1][2]:
+            failures.append(f"get_report {encoding}: bodies differ")
+        for name in ('Content-Encoding', 'Cache-Control', 'Vary', 'ETag'):
+            if header(results[0][1], name) != header(results[1][1], name):
+                failures.append(f"get_report {encoding}: {name} {header(results[0][1], name)} != "
+                                f"{header(results[1][1], name)}")
+        revalidated = [await raw_get(side, "/api/get_report", {'session_id': sid},
+                                     dict(headers, **{'If-None-Match': result[1].get('ETag', '')}))
+                       for side, sid, result in zip((flask_side, asgi_side), sids, results)]
+        if [r[0] for r in revalidated] != [304, 304]:
+            failures.append(f"get_report {encoding}: revalidation {[r[0] for r in revalidated]}")
+
+    for report_type in ('quick', 'detailed'):
+        results = [await side.request("GET", "/api/download_report", {'session_id': sid, 'type': report_type})
+                   for side, sid in zip((flask_side, asgi_side), sids)]
+        for (status, headers, body), name in zip(results, ("flask", "asgi")):
+            if status != 200 or not body.startswith(b"%PDF") or headers.get('Content-Type') != 'application/pdf':
+                failures.append(f"download {report_type} ({name}): {status} {headers.get('Content-Type')}")
+        dispositions = [headers.get('Content-Disposition') for _, headers, _ in results]
+        if dispositions[0] != dispositions[1]:
+            failures.append(f"download {report_type}: {dispositions}")
+
+    # Routes left on Flask are reached through the dispatcher
+    for path, build in (("/api/what_if", lambda sid: {'session_id': sid}), ("/api/knowledge_bases", lambda sid: {})):
+        results = [await side.request("GET", path, build(sid)) for side, sid in zip((flask_side, asgi_side), sids)]
+        compare(path, *results, session_ids, failures)
+
+    status_results = [await side.request("GET", "/api/status") for side in (flask_side, asgi_side)]
+    compare("status", *status_results, session_ids, failures)
+
+    for filename in os.listdir("."):
+        if filename.startswith("security_assessment_") and filename.endswith(".pdf"):
+            os.remove(filename)
+    await asgi_side.client.aclose()
+    return failures
+
+
+async def run_load(sessions, answers):
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=application), base_url="http://asgi", timeout=None)
+    peak_threads = threading.active_count()
+    latencies = []
+
+    async def one_session():
+        nonlocal peak_threads
+        sid = (await client.post("/api/start_session", json={})).json()['session_id']
+        for message in STORE_ANSWERS + answers:
+            await client.post("/api/message", json={'session_id': sid, 'message': message})
+        start = time.monotonic()
+        response = await client.get("/api/get_report", params={'session_id': sid})
+        latencies.append(time.monotonic() - start)
+        peak_threads = max(peak_threads, threading.active_count())
+        return response.status_code == 200 and response.json()['ready']
+
+    start = time.monotonic()
+    results = await asyncio.gather(*(one_session() for _ in range(sessions)))
+    elapsed = time.monotonic() - start
+    await client.aclose()
+
+    p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+    print(f"{sessions} concurrent sessions in {elapsed:.1f} s, {sum(results)} reports ready")
+    print(f"get_report latency p50 {statistics.median(latencies):.2f} s, p95 {p95:.2f} s; "
+          f"peak threads {peak_threads}")
+    return all(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300, help="concurrent sessions for the load run")
+    parser.add_argument("--area-latency", type=float, default=0.2, help="seconds of fake area-analysis I/O")
+    parser.add_argument("--check", action="store_true", help="parity only, with no area-analysis latency")
+    args = parser.parse_args()
+    if args.check:
+        args.sessions, args.area_latency = 0, 0.0
+
+    survey.AreaAnalysis.analyze_area = fake_area_analysis(args.area_latency)
+    data_processor = survey.knowledge_bases.get()
+    # Enough "No" answers to finish the adaptive survey whatever it skips
+    answers = ["N"] * len(data_processor.questions)
+
+    failures = asyncio.run(check_parity(answers))
+    for failure in failures:
+        print(failure)
+    print(f"parity: {'FAIL' if failures else 'OK'}")
+
+    ok = asyncio.run(run_load(args.sessions, answers)) if args.sessions else True
+    if failures or not ok:
+        print("FAIL")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
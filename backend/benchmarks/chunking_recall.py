@@ -0,0 +1,152 @@
+"""Vector count and retrieval quality of row packing vs one document per row.
+
+Compares the default chunking (chunking.row_chunks: one document per row
+through RecursiveCharacterTextSplitter(1000, 200)) with chunking.pack_rows at
+a few token budgets. It reports vectors, embedding time, flat index size, search
+latency and row recall@k, using the support bot's embedding model.
+
+Queries are cell texts of sampled rows. A hit means a returned chunk covers
+the row the text came from. --incidents adds a synthetic incident log of
+short rows, the case packing is for.
+
+--embeddings hashing swaps the model for a hashed bag of words (no download),
+for machines that cannot reach the Hugging Face hub. Its recall is lexical
+and only comparable between chunkings within one run.
+
+Measured with --embeddings hashing (the MiniLM model could not be downloaded
+on the machine used; rerun without the flag for model recall), recall@5:
+
+    workbook                 vectors  recall    + 5000 incidents   vectors  recall
+    per row                       67   0.600    per row               5067   1.000
+    packed 128                    67   0.585    packed 128            2567   0.700
+    packed 200                    66   0.585    packed 200            1316   0.395
+
+Lexical matching rewards an exact one-row chunk, so this overstates what
+packing costs a semantic model, but the incident-log drop is why packing
+stays opt-in until it is rerun with the real model.
+
+Usage (from backend/):
+    python benchmarks/chunking_recall.py [--workbook chatbotdata.xlsx] [--incidents 5000] [--queries 200] [--k 5]
+                                         [--embeddings minilm|hashing]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.embeddings import HuggingFaceEmbeddings  # noqa: E402
+
+from chunking import format_value, load_sheets, pack_rows, row_chunks  # noqa: E402
+from vector_index import create_index  # noqa: E402
+
+BUDGETS = [128, 200]
+
+
+def incident_log(n, seed=0):
+    rng = random.Random(seed)
+    risks = ["Concealment", "Petty theft", "Verbal Abuse", "Criminal Damage", "Fraud at POS", "Trolley pushout"]
+    actors = ["A customer", "Two youths", "A regular", "An unknown male", "A delivery driver", "A group of adults"]
+    actions = ["concealed", "took", "damaged", "threatened staff over", "ran out with", "swapped labels on"]
+    items = ["razor blades", "baby formula", "spirits", "meat joints", "phone chargers", "coffee jars", "cosmetics"]
+    places = ["the front entrance", "self checkout", "aisle 4", "the car park", "the kiosk", "the loading bay"]
+    rows = []
+    for i in range(n):
+        rows.append({
+            "Date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "Store": f"Store {rng.randint(1, 400)}",
+            "Risk Type": rng.choice(risks),
+            "Severity": rng.choice(["Low", "Medium", "High"]),
+            "Notes": f"{rng.choice(actors)} {rng.choice(actions)} {rng.choice(items)} near {rng.choice(places)} "
+                     f"(ref {i})"
+        })
+    return pd.DataFrame(rows)
+
+
+class HashingEmbeddings:
+    """Offline stand-in for the embedding model: L2-normalised hashed word and bigram counts"""
+
+    def __init__(self, dimensions=384):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.vectorizer = HashingVectorizer(n_features=dimensions, ngram_range=(1, 2), alternate_sign=False)
+
+    def embed_documents(self, texts):
+        return self.vectorizer.transform(texts).toarray()
+
+
+def sample_queries(sheets, n, seed=1):
+    """(sheet, row, query text) for random rows with a descriptive cell"""
+    rng = random.Random(seed)
+    candidates = []
+    for sheet_name, df in sheets:
+        for idx, row in df.iterrows():
+            texts = [format_value(v) for v in row if len(format_value(v).split()) >= 4]
+            if texts:
+                candidates.append((sheet_name, idx, " ".join(rng.choice(texts).split()[:16])))
+    return rng.sample(candidates, min(n, len(candidates)))
+
+
+def covers(doc, sheet_name, idx):
+    meta = doc.metadata
+    start = meta.get("row_start", meta.get("row"))
+    end = meta.get("row_end", meta.get("row"))
+    return meta.get("source") == sheet_name and start <= idx <= end
+
+
+def evaluate(name, documents, embeddings, queries, query_vectors, k):
+    start = time.perf_counter()
+    vectors = np.asarray(embeddings.embed_documents([d.page_content for d in documents]), dtype="float32")
+    embed_seconds = time.perf_counter() - start
+
+    index = create_index("Flat", vectors, vectors.shape[1])
+    index.add(vectors)
+
+    hits, latencies = 0, []
+    for (sheet_name, idx, _), query in zip(queries, query_vectors):
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += any(covers(documents[i], sheet_name, idx) for i in ids[0] if i >= 0)
+
+    print(f"{name:<14}{len(documents):>9}{embed_seconds:>10.1f}{vectors.nbytes / 1e6:>10.2f}"
+          f"{statistics.median(latencies):>10.3f}{hits / len(queries):>10.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workbook", default="chatbotdata.xlsx")
+    parser.add_argument("--incidents", type=int, default=0, help="rows of synthetic incident log to add")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--embeddings", choices=["minilm", "hashing"], default="minilm")
+    args = parser.parse_args()
+
+    sheets = load_sheets(args.workbook)
+    if args.incidents:
+        sheets.append(("Incident Log", incident_log(args.incidents)))
+
+    if args.embeddings == "hashing":
+        embeddings = HashingEmbeddings()
+    else:
+        embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    queries = sample_queries(sheets, args.queries)
+    query_vectors = np.asarray(embeddings.embed_documents([q[2] for q in queries]), dtype="float32")
+
+    rows = sum(len(df) for _, df in sheets)
+    print(f"{rows} rows in {len(sheets)} sheets, {len(queries)} queries, recall@{args.k}, {args.embeddings}")
+    print(f"{'chunking':<14}{'vectors':>9}{'embed s':>10}{'index MB':>10}{'search ms':>10}{'recall':>10}")
+
+    evaluate("per row", row_chunks(sheets), embeddings, queries, query_vectors, args.k)
+    for budget in BUDGETS:
+        evaluate(f"packed {budget}", pack_rows(sheets, budget), embeddings, queries, query_vectors, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""Load test of the LLM gateway against a local fake Mistral server.
+
+The fake server speaks the /chat/completions API. It simulates latency, a
+provider concurrency limit and a request rate limit (both answered with 429
+and Retry-After), and a share of hung requests. Many concurrent clients, some
+sending duplicate prompts, call it through a GatewayChatModel. The run fails
+if the provider ever sees more concurrent calls than the gateway allows, or
+if any request errors.
+
+Usage (from backend/):
+    python benchmarks/fake_llm_server.py [--clients 100] [--concurrency 8] [--duplicates 0.3]
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_mistralai.chat_models import ChatMistralAI  # noqa: E402
+
+from llm_gateway import GatewayChatModel, LLMGateway  # noqa: E402
+
+
+class FakeProvider:
+    def __init__(self, latency, max_in_flight, rate, hang_rate, hang_seconds):
+        self.latency = latency
+        self.max_in_flight = max_in_flight
+        self.rate = rate
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.window = []  # request timestamps in the last second
+        self.counts = {"requests": 0, "rate_limited": 0, "hung": 0}
+
+    def admit(self):
+        """None if the request may proceed, else the Retry-After in seconds"""
+        now = time.monotonic()
+        with self.lock:
+            self.counts["requests"] += 1
+            self.window = [t for t in self.window if now - t < 1]
+            if self.in_flight >= self.max_in_flight or len(self.window) >= self.rate:
+                self.counts["rate_limited"] += 1
+                return 1 if len(self.window) >= self.rate else 0
+            self.window.append(now)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            return None
+
+    def release(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def handler(self):
+        provider = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, body, headers=()):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                wait = provider.admit()
+                if wait is not None:
+                    self.reply(429, {"message": "Requests rate limit exceeded"}, [("Retry-After", str(wait))])
+                    return
+                try:
+                    if random.random() < provider.hang_rate:
+                        with provider.lock:
+                            provider.counts["hung"] += 1
+                        time.sleep(provider.hang_seconds)
+                    time.sleep(random.uniform(0.5, 1.5) * provider.latency)
+                    prompt = request["messages"][-1]["content"]
+                    self.reply(200, {
+                        "id": "fake",
+                        "choices": [{
+                            "index": 0,
+                            "finish_reason": "stop",
+                            "message": {"role": "assistant", "content": f"echo: {prompt}"}
+                        }],
+                        "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+                    })
+                finally:
+                    provider.release()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=100, help="concurrent client requests")
+    parser.add_argument("--concurrency", type=int, default=8, help="gateway concurrency limit")
+    parser.add_argument("--provider-limit", type=int, default=8, help="provider concurrent-request limit")
+    parser.add_argument("--rate", type=float, default=40, help="provider requests per second")
+    parser.add_argument("--latency", type=float, default=0.2, help="mean provider latency (s)")
+    parser.add_argument("--duplicates", type=float, default=0.3, help="share of clients repeating a prompt")
+    parser.add_argument("--hang-rate", type=float, default=0.02, help="share of provider calls that hang")
+    parser.add_argument("--call-timeout", type=float, default=2)
+    parser.add_argument("--deadline", type=float, default=30)
+    args = parser.parse_args()
+
+    provider = FakeProvider(args.latency, args.provider_limit, args.rate, args.hang_rate, args.call_timeout * 2)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), provider.handler())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    gateway = LLMGateway(max_concurrency=args.concurrency, call_timeout=args.call_timeout,
+                         deadline=args.deadline, retries=5)
+    llm = GatewayChatModel(
+        model=ChatMistralAI(
+            endpoint=f"http://127.0.0.1:{server.server_port}",
+            mistral_api_key="fake",
+            max_retries=0,
+            timeout=args.call_timeout * 3
+        ),
+        gateway=gateway
+    )
+
+    popular = [f"What mitigations exist for risk {i}?" for i in range(5)]
+    prompts = [
+        random.choice(popular) if random.random() < args.duplicates else f"Question {i}"
+        for i in range(args.clients)
+    ]
+
+    def ask(prompt):
+        start = time.monotonic()
+        try:
+            llm.invoke(prompt)
+            return time.monotonic() - start, None
+        except Exception as e:
+            return time.monotonic() - start, type(e).__name__
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        results = list(pool.map(ask, prompts))
+    elapsed = time.monotonic() - start
+    server.shutdown()
+
+    latencies = [latency for latency, error in results if error is None]
+    errors = [error for _, error in results if error is not None]
+    print(f"{args.clients} requests in {elapsed:.1f} s; {len(latencies)} ok, {len(errors)} failed {sorted(set(errors))}")
+    if latencies:
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        print(f"latency p50 {statistics.median(latencies):.2f} s, p95 {p95:.2f} s")
+    print(f"provider: {provider.counts}, peak concurrent calls {provider.peak_in_flight}")
+    print(f"gateway: {dict(gateway.stats)}")
+
+    if provider.peak_in_flight > args.concurrency or errors:
+        print("FAIL")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Cold-import benchmark for the backend, based on `python -X importtime`.
+
+Imports `app` in fresh interpreters, reports the median cumulative import
+time and the heaviest direct imports, and compares against the tracked
+baseline in import_time_baseline.json. It also fails if any heavy dependency
+is imported eagerly again.
+
+Usage (from backend/):
+    python benchmarks/import_time.py [--runs 5] [--update]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_time_baseline.json")
+
+# Must only load on first use or in prewarm(), never when app is imported
+HEAVY_MODULES = ["pandas", "langchain", "langchain_mistralai", "reportlab", "googlemaps", "geopy", "fpdf"]
+
+# Timing is noisy; only flag clear regressions
+TOLERANCE = 0.5
+
+
+def profile_import(module="app"):
+    """One cold import; returns {module: cumulative microseconds} and the
+    direct imports of the profiled module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+    cumulative, direct = {}, {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cum, name = line.split("|")
+        if not cum.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        name = name.strip()
+        cumulative[name] = int(cum)
+        if depth == 1:
+            direct[name] = int(cum)
+    return cumulative, direct
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--update", action="store_true", help="record the result as the new baseline")
+    args = parser.parse_args()
+
+    totals, heaviest = [], {}
+    for _ in range(args.runs):
+        cumulative, direct = profile_import()
+        totals.append(cumulative["app"])
+        for name, value in direct.items():
+            heaviest.setdefault(name, []).append(value)
+
+    median_ms = statistics.median(totals) / 1000
+    print(f"import app: median {median_ms:.1f} ms over {args.runs} runs")
+    for name, values in sorted(heaviest.items(), key=lambda item: -statistics.median(item[1]))[:10]:
+        print(f"  {statistics.median(values) / 1000:8.1f} ms  {name}")
+
+    eager = sorted(
+        name for name in cumulative
+        if name.split(".")[0] in HEAVY_MODULES
+    )
+    if eager:
+        print(f"Heavy modules imported eagerly: {', '.join(sorted({n.split('.')[0] for n in eager}))}")
+
+    if args.update:
+        with open(BASELINE_PATH, "w") as f:
+            json.dump({"median_ms": round(median_ms, 1), "python": sys.version.split()[0]}, f, indent=2)
+            f.write("\n")
+        print(f"Baseline updated: {median_ms:.1f} ms")
+        return 0
+
+    with open(BASELINE_PATH) as f:
+        baseline = json.load(f)
+    limit = baseline["median_ms"] * (1 + TOLERANCE)
+    print(f"Baseline {baseline['median_ms']:.1f} ms, limit {limit:.1f} ms")
+    if eager or median_ms > limit:
+        print("FAIL")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+"""Parallel bulk PDF export, streamed as a ZIP archive.
+
+PDF rendering is CPU-bound and holds the GIL, so reports are rendered in a
+process pool and written into the archive as each one completes. At most a
+small window of reports is in flight, which keeps memory bounded regardless of
+how many stores are exported.
+
+Usage:
+    python bulk_export.py batch.json -o estate.zip [--type quick] [--workers 8]
+
+where batch.json is a list of assessments
+({"id", "store_data", "answers", "area_data"}), as accepted by
+/api/portfolio/ingest.
+"""
+import argparse
+import io
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from multiprocessing import get_context
+
+from streams import ChunkSink
+
+logger = logging.getLogger(__name__)
+
+# Reports in flight per worker; bounds memory held by finished-but-unwritten PDFs
+WINDOW_PER_WORKER = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide render pool for the web app, created on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: forking a threaded web server can copy held locks
+            _pool = ProcessPoolExecutor(max_workers=os.cpu_count(), mp_context=get_context("spawn"))
+        return _pool
+
+
+def render_payload(payload):
+    """Worker entry point: render one PDF payload to bytes"""
+    from app import render_pdf
+
+    buffer = io.BytesIO()
+    if not render_pdf(payload, buffer):
+        raise RuntimeError(f"Failed to render report for {payload['name']}")
+    return archive_name(payload), buffer.getvalue()
+
+
+def archive_name(payload):
+    name = re.sub(r'[^A-Za-z0-9_.-]+', '_', str(payload['name'])).strip('_') or 'store'
+    return f"security_assessment_{payload['report_type']}_{name}.pdf"
+
+
+def unique_name(name, used):
+    """name, suffixed with a counter if an earlier report in the archive already has it"""
+    stem, ext = os.path.splitext(name)
+    candidate, n = name, 1
+    while candidate in used:
+        n += 1
+        candidate = f"{stem}_{n}{ext}"
+    used.add(candidate)
+    return candidate
+
+
+def stream_zip(payloads, pool, workers, failures=None):
+    """Yield a ZIP archive of rendered PDFs, in completion order.
+
+    A report that fails to render is logged and listed in errors.json at the
+    end of the archive, and in failures if a list is given.
+    """
+    failures = [] if failures is None else failures
+    sink = ChunkSink()
+    archive = zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED)
+    payloads = iter(payloads)
+    window = max(1, workers * WINDOW_PER_WORKER)
+    pending = {}  # future -> assessment name
+    used = set()
+
+    def refill():
+        while len(pending) < window:
+            payload = next(payloads, None)
+            if payload is None:
+                return
+            pending[pool.submit(render_payload, payload)] = payload['name']
+
+    refill()
+    while pending:
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            assessment = pending.pop(future)
+            try:
+                name, data = future.result()
+            except Exception as e:
+                logger.error("Bulk export failed to render %s: %s", assessment, e)
+                failures.append({'id': assessment, 'error': str(e)})
+                continue
+            archive.writestr(unique_name(name, used), data)
+            yield sink.drain()
+        refill()
+
+    if failures:
+        archive.writestr("errors.json", json.dumps(failures, indent=2))
+    archive.close()
+    yield sink.drain()
+
+
+def assessment_payloads(data_processor, assessments, report_type):
+    """PDF payloads for batch-analysis input, built lazily one at a time"""
+    generated_on = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for assessment in assessments:
+        answers = data_processor.pack_answers(assessment.get('answers', {}))
+        risk_bits = data_processor.risk_bits(answers.negative)
+        if report_type == "detailed":
+            report = data_processor.build_detailed_report(risk_bits)
+        else:
+            report = data_processor.build_quick_report(risk_bits)
+        yield {
+            'name': assessment['id'],
+            'report_type': report_type,
+            'report': report,
+            'store_data': assessment.get('store_data', {}),
+            'answers': dict(answers),
+            'area_data': assessment.get('area_data'),
+            'kb_version': data_processor.kb_version,
+            'generated_on': generated_on
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render security assessment PDFs for many stores into one ZIP")
+    parser.add_argument("input", help="JSON file with a list of assessments")
+    parser.add_argument("-o", "--output", default="security_assessments.zip")
+    parser.add_argument("--type", choices=["quick", "detailed"], default="detailed")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--kb", help="knowledge base ID (default: assumption.xlsx)")
+    args = parser.parse_args()
+
+    from app import knowledge_bases
+    from knowledge_bases import UnknownKnowledgeBase
+    from portfolio import assessment_error
+
+    try:
+        data_processor = knowledge_bases.get(args.kb)
+    except UnknownKnowledgeBase:
+        parser.error(f"unknown knowledge base: {args.kb}")
+
+    with open(args.input) as f:
+        assessments = json.load(f)
+    error = assessment_error(assessments, data_processor.question_ids)
+    if error:
+        parser.error(f"{args.input}: {error}")
+
+    failures = []
+    payloads = assessment_payloads(data_processor, assessments, args.type)
+    with ProcessPoolExecutor(max_workers=args.workers, mp_context=get_context("spawn")) as pool, \
+            open(args.output, "wb") as out:
+        for chunk in stream_zip(payloads, pool, args.workers, failures):
+            out.write(chunk)
+    print(f"Wrote {len(assessments) - len(failures)} of {len(assessments)} reports to {args.output}")
+    if failures:
+        print(f"{len(failures)} failed; see errors.json in the archive")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Sheet-aware chunking of workbooks for the support bot's vector index.
+
+One document per spreadsheet row wastes an embedding on every short row.
+Instead, adjacent rows of a sheet are packed into chunks that fit the
+embedding model's input, and the column header is written once per chunk.
+Each chunk records the row range it covers, and every row keeps its "Row N"
+label, so answers can still cite exact rows.
+
+Packing is opt-in (SUPPORT_CHUNKING=packed in support.py) until its recall
+with the embedding model has been measured; row_chunks is the default.
+"""
+import math
+import re
+from typing import List, Tuple
+
+import pandas as pd
+from langchain.schema import Document
+
+# all-MiniLM-L6-v2 truncates its input at 256 word pieces
+MODEL_TOKENS = 256
+# Packing budget, left below MODEL_TOKENS for estimation error
+CHUNK_TOKENS = 200
+
+# Word pieces per word/punctuation token, for estimating without a tokenizer
+PIECES_PER_WORD = 1.3
+
+WORD = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(WORD.findall(text)) * PIECES_PER_WORD)
+
+
+def load_sheets(excel_file) -> List[Tuple[str, pd.DataFrame]]:
+    xl = pd.ExcelFile(excel_file)
+    return [(sheet_name, xl.parse(sheet_name)) for sheet_name in xl.sheet_names]
+
+
+def format_value(value) -> str:
+    return "" if pd.isna(value) else " ".join(str(value).split())
+
+
+def row_documents(sheets) -> List[Document]:
+    """One document per row, as "column: value" lines"""
+    documents = []
+    for sheet_name, df in sheets:
+        for idx, row in df.iterrows():
+            content = f"Sheet: {sheet_name}\n"
+            for col, value in row.items():
+                if pd.notna(value):
+                    content += f"{col}: {value}\n"
+            documents.append(Document(
+                page_content=content,
+                metadata={"source": f"{sheet_name}", "row": idx}
+            ))
+    return documents
+
+
+def row_chunks(sheets) -> List[Document]:
+    """One document per row, with over-long rows cut by character count"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+    return splitter.split_documents(row_documents(sheets))
+
+
+def chunk_document(sheet_name, rows, lines, header):
+    return Document(
+        page_content=header + "\n".join(lines),
+        metadata={"source": sheet_name, "row": rows[0], "row_start": rows[0], "row_end": rows[-1]}
+    )
+
+
+def wide_row_documents(sheet_name, idx, columns, values, budget=MODEL_TOKENS) -> List[Document]:
+    """A row too wide to pack, as its own chunk; split between columns, without
+    overlap, only where it would not fit the model's input"""
+    header = f"Sheet: {sheet_name}\nRow {idx}:\n"
+    documents, lines, used = [], [], estimate_tokens(header)
+    for column, value in zip(columns, values):
+        if not value:
+            continue
+        line = f"{column}: {value}"
+        cost = estimate_tokens(line)
+        if lines and used + cost > budget:
+            documents.append(chunk_document(sheet_name, [idx], lines, header))
+            lines, used = [], estimate_tokens(header)
+        lines.append(line)
+        used += cost
+    if lines:
+        documents.append(chunk_document(sheet_name, [idx], lines, header))
+    return documents
+
+
+def pack_rows(sheets, budget: int = CHUNK_TOKENS) -> List[Document]:
+    """Pack adjacent rows of each sheet into chunks of at most budget tokens"""
+    documents = []
+    for sheet_name, df in sheets:
+        columns = [str(column) for column in df.columns]
+        header = f"Sheet: {sheet_name}\nColumns: {' | '.join(columns)}\n"
+        header_tokens = estimate_tokens(header)
+        rows, lines, used = [], [], header_tokens
+
+        for idx, row in df.iterrows():
+            values = [format_value(value) for value in row]
+            if not any(values):
+                continue
+            line = f"Row {idx}: {' | '.join(values)}"
+            cost = estimate_tokens(line)
+
+            if lines and used + cost > budget:
+                documents.append(chunk_document(sheet_name, rows, lines, header))
+                rows, lines, used = [], [], header_tokens
+            if header_tokens + cost > budget:
+                documents.extend(wide_row_documents(sheet_name, idx, columns, values))
+                continue
+            rows.append(idx)
+            lines.append(line)
+            used += cost
+
+        if lines:
+            documents.append(chunk_document(sheet_name, rows, lines, header))
+    return documents
@@ -0,0 +1,32 @@
+import threading
+from collections import OrderedDict
+
+
+class ReportFragmentCache:
+    """Report pieces that depend only on the knowledge base, built once per
+    knowledge-base version and shared by every session and report"""
+
+    def __init__(self, max_versions=8):
+        self.max_versions = max_versions
+        self.lock = threading.Lock()
+        self.versions = OrderedDict()
+
+    def get(self, version, key, build):
+        with self.lock:
+            fragments = self.versions.get(version)
+            if fragments is not None and key in fragments:
+                self.versions.move_to_end(version)
+                return fragments[key]
+        
+        value = build()
+        with self.lock:
+            fragments = self.versions.setdefault(version, {})
+            self.versions.move_to_end(version)
+            # Forget fragments of the least recently used knowledge-base versions
+            while len(self.versions) > self.max_versions:
+                self.versions.popitem(last=False)
+            return fragments.setdefault(key, value)
+
+
+# Knowledge-base-only report fragments, shared across sessions
+report_fragments = ReportFragmentCache()
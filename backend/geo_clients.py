@@ -0,0 +1,162 @@
+import functools
+import os
+import random
+import threading
+import time
+
+import googlemaps
+import requests
+from geopy.adapters import RequestsAdapter
+from geopy.exc import GeocoderRateLimited, GeocoderTimedOut, GeocoderUnavailable
+from geopy.geocoders import Nominatim
+from googlemaps.exceptions import ApiError, Timeout, TransportError, _OverQueryLimit
+
+# Keep-alive connections per provider, shared by every session in the process
+POOL_SIZE = 20
+
+# Nominatim usage policy allows at most 1 request per second
+NOMINATIM_RATE = 1.0
+PLACES_RATE = 10.0
+
+# A fresh next_page_token is rejected until Google has prepared the page
+PAGE_TOKEN_POLL_START = 0.5
+PAGE_TOKEN_POLL_TIMEOUT = 10
+
+
+class TokenBucket:
+    """Thread-safe token bucket with an adaptive (AIMD) refill rate.
+
+    Throttling responses halve the rate; each success restores a little of it,
+    up to the configured maximum.
+    """
+
+    def __init__(self, rate, burst=1, min_rate=None):
+        self.max_rate = rate
+        self.min_rate = min_rate or rate / 16
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def throttled(self):
+        with self.lock:
+            self.refill(time.monotonic())
+            self.rate = max(self.min_rate, self.rate / 2)
+
+    def succeeded(self):
+        with self.lock:
+            self.refill(time.monotonic())
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+def call_with_backoff(func, limiter, retries=4, base_delay=0.5, max_delay=16,
+                      throttle_errors=(), retry_errors=()):
+    """Call func under the provider's rate limiter, retrying with full-jitter
+    exponential backoff on throttling and transient errors"""
+    for attempt in range(retries + 1):
+        limiter.acquire()
+        try:
+            result = func()
+        except throttle_errors:
+            limiter.throttled()
+            if attempt == retries:
+                raise
+        except retry_errors:
+            if attempt == retries:
+                raise
+        else:
+            limiter.succeeded()
+            return result
+        time.sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+
+nominatim_limiter = TokenBucket(NOMINATIM_RATE)
+places_limiter = TokenBucket(PLACES_RATE, burst=5)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_geocoder():
+    """Process-wide Nominatim geocoder over a pooled keep-alive session"""
+    with _clients_lock:
+        if 'nominatim' not in _clients:
+            _clients['nominatim'] = Nominatim(
+                user_agent="security_assessment_app",
+                adapter_factory=functools.partial(
+                    RequestsAdapter, pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE
+                )
+            )
+        return _clients['nominatim']
+
+
+def get_places_client():
+    """Process-wide Google Maps client, or None when no API key is configured"""
+    api_key = os.getenv("GOOGLE_PLACES_API_KEY")
+    if not api_key:
+        return None
+    with _clients_lock:
+        if _clients.get('places_key') != api_key:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            # Throttling and retries are handled by call_with_backoff
+            _clients['places'] = googlemaps.Client(
+                key=api_key,
+                requests_session=session,
+                retry_over_query_limit=False,
+                queries_per_second=1000,
+                queries_per_minute=60000
+            )
+            _clients['places_key'] = api_key
+        return _clients['places']
+
+
+def geocode(query):
+    return call_with_backoff(
+        lambda: get_geocoder().geocode(query),
+        nominatim_limiter,
+        throttle_errors=(GeocoderRateLimited,),
+        retry_errors=(GeocoderTimedOut, GeocoderUnavailable)
+    )
+
+
+def places_nearby(client, **params):
+    return call_with_backoff(
+        lambda: client.places_nearby(**params),
+        places_limiter,
+        throttle_errors=(_OverQueryLimit,),
+        retry_errors=(Timeout, TransportError)
+    )
+
+
+def places_next_page(client, page_token):
+    """Fetch the next results page, polling until the token becomes valid
+    rather than sleeping a fixed interval"""
+    delay = PAGE_TOKEN_POLL_START
+    deadline = time.monotonic() + PAGE_TOKEN_POLL_TIMEOUT
+    while True:
+        time.sleep(delay)
+        try:
+            return places_nearby(client, page_token=page_token)
+        except ApiError as e:
+            # Google answers INVALID_REQUEST until the page is ready
+            if e.status != 'INVALID_REQUEST' or time.monotonic() + delay > deadline:
+                raise
+        delay = min(delay * 1.5, 2)
@@ -0,0 +1,118 @@
+"""Background knowledge-base ingestion for the support chatbot.
+
+Parsing, chunking, embedding and indexing run in a worker thread, so the
+Streamlit UI stays responsive while a large workbook is loaded. Chunks are
+embedded and added to the index in batches. The part indexed so far can be
+searched while the rest is still being processed.
+"""
+import threading
+from typing import Any, Callable, List, Optional
+
+import numpy as np
+
+from vector_index import add_vectors, create_index, create_vectorstore, index_spec, training_size
+
+EMBED_BATCH_SIZE = 64
+
+# Documents returned per query, as the original retriever used
+RETRIEVER_K = 5
+
+
+class IngestionPipeline:
+    """parse -> chunk -> embed in batches -> add to index, on a daemon thread"""
+
+    def __init__(self, source: Any, load_documents: Callable[[Any], List], split_documents: Callable[[List], List],
+                 embeddings, index_type: Optional[str] = "auto", quantization: Optional[str] = None,
+                 batch_size: int = EMBED_BATCH_SIZE):
+        self.source = source
+        self.load_documents = load_documents
+        self.split_documents = split_documents
+        self.embeddings = embeddings
+        self.index_type = index_type
+        self.quantization = quantization
+        self.batch_size = batch_size
+
+        # Guards the vector store: FAISS does not allow adds concurrent with searches
+        self.lock = threading.Lock()
+        self.vectorstore = None
+        self.stage = "queued"
+        self.total = 0
+        self.indexed = 0
+        self.error = None
+        self.thread = threading.Thread(target=self.run, name="kb-ingestion", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    @property
+    def done(self) -> bool:
+        return self.stage in ("done", "failed")
+
+    @property
+    def failed(self) -> bool:
+        return self.stage == "failed"
+
+    def progress(self) -> float:
+        if self.stage == "done":
+            return 1.0
+        return self.indexed / self.total if self.total else 0.0
+
+    def status(self) -> str:
+        if self.stage in ("embedding", "done"):
+            return f"Indexed {self.indexed} of {self.total} chunks"
+        return f"{self.stage.capitalize()}..."
+
+    def run(self):
+        try:
+            self.stage = "parsing"
+            documents = self.load_documents(self.source)
+            # The pipeline outlives ingestion in the app's cache; keep only the index
+            self.source = self.load_documents = None
+            self.stage = "chunking"
+            chunks = self.split_documents(documents)
+            self.total = len(chunks)
+            self.stage = "embedding"
+            self.index_chunks(chunks)
+            self.stage = "done"
+        except Exception as e:
+            print(f"Error ingesting knowledge base: {str(e)}")
+            self.error = str(e)
+            self.stage = "failed"
+
+    def index_chunks(self, chunks: List):
+        spec = None
+        pending_docs, pending_vectors = [], []
+
+        for start in range(0, len(chunks), self.batch_size):
+            batch = chunks[start:start + self.batch_size]
+            vectors = np.asarray(
+                self.embeddings.embed_documents([doc.page_content for doc in batch]), dtype="float32"
+            )
+
+            if self.vectorstore is None:
+                dim = vectors.shape[1]
+                spec = spec or index_spec(len(chunks), self.index_type, self.quantization, dim)
+                pending_docs.extend(batch)
+                pending_vectors.append(vectors)
+                # Trained indexes wait for a sample; untrained ones start searchable at once
+                if len(pending_docs) < training_size(spec, len(chunks), dim):
+                    continue
+                vectors = np.concatenate(pending_vectors)
+                batch, pending_docs, pending_vectors = pending_docs, [], []
+                vectorstore = create_vectorstore(self.embeddings, create_index(spec, vectors, dim))
+                add_vectors(vectorstore, batch, vectors)
+                with self.lock:
+                    self.vectorstore = vectorstore
+            else:
+                with self.lock:
+                    add_vectors(self.vectorstore, batch, vectors)
+            self.indexed += len(batch)
+
+    def get_relevant_documents(self, query: str, k: int = RETRIEVER_K) -> List:
+        """Nearest chunks among those indexed so far"""
+        if self.vectorstore is None:
+            return []
+        embedding = self.embeddings.embed_query(query)
+        with self.lock:
+            return self.vectorstore.similarity_search_by_vector(embedding, k=k)
@@ -0,0 +1,126 @@
+"""Compiled knowledge bases by ID, shared across sessions.
+
+A knowledge base is one client's workbook of survey questions, risk matrix and
+assurance metrics. "default" is assumption.xlsx; any other ID names
+<KNOWLEDGE_BASE_DIR>/<id>.xlsx. Workbooks are compiled on first use and kept
+in a bounded LRU, so one process can serve many clients without holding every
+workbook in memory.
+
+A workbook that changes on disk is compiled beside the live copy and swapped
+in under the lock. New sessions get the new version. Sessions already holding
+the old one keep it, so their packed answers stay consistent.
+"""
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List
+
+DEFAULT_KB_ID = "default"
+DEFAULT_KB_PATH = os.getenv("KNOWLEDGE_BASE_DEFAULT", "assumption.xlsx")
+KB_DIR = os.getenv("KNOWLEDGE_BASE_DIR", "knowledge_bases")
+MAX_LOADED = int(os.getenv("KNOWLEDGE_BASE_CACHE_SIZE", "8"))
+# Seconds between checks of a loaded workbook for changes
+CHECK_INTERVAL = float(os.getenv("KNOWLEDGE_BASE_CHECK_INTERVAL", "5"))
+
+KB_ID = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+
+
+class UnknownKnowledgeBase(KeyError):
+    pass
+
+
+class KnowledgeBaseRegistry:
+    """Bounded LRU of compiled knowledge bases, reloaded when their workbook changes"""
+
+    def __init__(self, compile: Callable[[str], object], directory=KB_DIR, default_path=DEFAULT_KB_PATH,
+                 max_loaded=MAX_LOADED, check_interval=CHECK_INTERVAL):
+        self.compile = compile
+        self.directory = directory
+        self.default_path = default_path
+        self.max_loaded = max_loaded
+        self.check_interval = check_interval
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # kb_id -> (file signature, last checked, compiled)
+        self.loading = {}  # kb_id -> Lock, so each workbook is compiled once at a time
+
+    def path_for(self, kb_id: str) -> str:
+        if not isinstance(kb_id, str):
+            # IDs come straight from request JSON
+            raise UnknownKnowledgeBase(kb_id)
+        if kb_id == DEFAULT_KB_ID:
+            path = self.default_path
+        elif KB_ID.fullmatch(kb_id):
+            path = os.path.join(self.directory, f"{kb_id}.xlsx")
+        else:
+            raise UnknownKnowledgeBase(kb_id)
+        if not os.path.isfile(path):
+            raise UnknownKnowledgeBase(kb_id)
+        return path
+
+    @staticmethod
+    def signature(path):
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def available(self) -> List[str]:
+        ids = [DEFAULT_KB_ID] if os.path.isfile(self.default_path) else []
+        if os.path.isdir(self.directory):
+            ids += sorted(
+                name[:-5] for name in os.listdir(self.directory)
+                if name.endswith(".xlsx") and KB_ID.fullmatch(name[:-5]) and name[:-5] != DEFAULT_KB_ID
+            )
+        return ids
+
+    def loaded(self) -> List[str]:
+        with self.lock:
+            return list(self.entries)
+
+    def get(self, kb_id: str = None):
+        """The compiled knowledge base for kb_id; raises UnknownKnowledgeBase"""
+        kb_id = kb_id or DEFAULT_KB_ID
+        if not isinstance(kb_id, str):
+            raise UnknownKnowledgeBase(kb_id)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(kb_id)
+            if entry is not None:
+                self.entries.move_to_end(kb_id)
+                if now - entry[1] < self.check_interval:
+                    return entry[2]
+
+        path = self.path_for(kb_id)
+        signature = self.signature(path)
+        if entry is not None and entry[0] == signature:
+            with self.lock:
+                if self.entries.get(kb_id) is entry:
+                    self.entries[kb_id] = (signature, now, entry[2])
+            return entry[2]
+        return self.load(kb_id, path, signature)
+
+    def reload(self, kb_id: str = None):
+        """Recompile kb_id now, whether or not its workbook looks changed"""
+        kb_id = kb_id or DEFAULT_KB_ID
+        path = self.path_for(kb_id)
+        return self.load(kb_id, path, self.signature(path), force=True)
+
+    def load(self, kb_id, path, signature, force=False):
+        with self.lock:
+            loading = self.loading.setdefault(kb_id, threading.Lock())
+
+        with loading:
+            # Another caller may have compiled this version while we waited
+            with self.lock:
+                entry = self.entries.get(kb_id)
+            if entry is not None and entry[0] == signature and not force:
+                return entry[2]
+
+            compiled = self.compile(path)
+            with self.lock:
+                self.entries[kb_id] = (signature, time.monotonic(), compiled)
+                self.entries.move_to_end(kb_id)
+                # Forget the least recently used; sessions using one keep their reference
+                while len(self.entries) > self.max_loaded:
+                    self.entries.popitem(last=False)
+            return compiled
@@ -0,0 +1,201 @@
+"""Process-wide gateway for LLM calls.
+
+Every chat model used by the backend and the support bot goes through one
+LLMGateway. It bounds concurrent provider calls and queues the rest, and it
+enforces per-call and overall deadlines. Throttled and transient failures are
+retried with jittered backoff. Identical prompts that are in flight at the
+same time share a single provider call.
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Callable, List, Optional
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.language_models.llms import LLM
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+# Seconds for one provider call, and for the whole request including queueing and retries
+CALL_TIMEOUT = float(os.getenv("LLM_CALL_TIMEOUT", "30"))
+DEADLINE = float(os.getenv("LLM_DEADLINE", "90"))
+RETRIES = int(os.getenv("LLM_RETRIES", "3"))
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def status_of(error) -> Optional[int]:
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) or getattr(error, "status_code", None)
+
+
+def retry_after(error) -> float:
+    """Delay requested by a throttling response, in seconds"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after", 0))
+    except ValueError:
+        return 0.0
+
+
+class LLMGateway:
+    """Bounded, deadline-aware and coalescing executor for provider calls"""
+
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, call_timeout=CALL_TIMEOUT, deadline=DEADLINE,
+                 retries=RETRIES, base_delay=0.5, max_delay=8):
+        self.call_timeout = call_timeout
+        self.deadline = deadline
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        # Each running call holds a slot, so this never queues for long
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-call")
+        self.lock = threading.Lock()
+        self.in_flight = {}  # prompt key -> Future shared by coalesced callers
+        self.stats = Counter()
+
+    @staticmethod
+    def is_retryable(error) -> bool:
+        status = status_of(error)
+        if status is not None:
+            return status in RETRY_STATUSES
+        return isinstance(error, (httpx.TransportError, TimeoutError, ConnectionError))
+
+    def call(self, key: str, func: Callable[[], Any], deadline: Optional[float] = None):
+        """Run func() through the gateway; callers with the same key while it is
+        in flight get the same result"""
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        with self.lock:
+            self.stats["requests"] += 1
+            shared = self.in_flight.get(key)
+            leader = shared is None
+            if leader:
+                shared = self.in_flight[key] = Future()
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            try:
+                return shared.result(timeout=max(0, deadline_at - time.monotonic()))
+            except FutureTimeoutError:
+                raise DeadlineExceeded("LLM request deadline exceeded") from None
+
+        try:
+            result = self.call_with_retries(func, deadline_at)
+        except BaseException as e:
+            shared.set_exception(e)
+            raise
+        else:
+            shared.set_result(result)
+            return result
+        finally:
+            with self.lock:
+                self.in_flight.pop(key, None)
+
+    def call_with_retries(self, func, deadline_at):
+        for attempt in range(self.retries + 1):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0 or not self.slots.acquire(timeout=remaining):
+                self.stats["deadline_exceeded"] += 1
+                raise DeadlineExceeded("Timed out waiting for an LLM slot")
+
+            future = self.executor.submit(self.run_in_slot, func)
+            self.stats["provider_calls"] += 1
+            delay = 0.0
+            try:
+                return future.result(timeout=max(0, min(self.call_timeout, deadline_at - time.monotonic())))
+            except FutureTimeoutError:
+                # The abandoned call keeps its slot until the client times out
+                self.stats["timeouts"] += 1
+                error = DeadlineExceeded("LLM call timed out")
+            except Exception as e:
+                if not self.is_retryable(e):
+                    raise
+                if status_of(e) == 429:
+                    self.stats["throttled"] += 1
+                    delay = retry_after(e)
+                error = e
+
+            if attempt == self.retries:
+                raise error
+            delay = max(delay, random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+            if time.monotonic() + delay >= deadline_at:
+                self.stats["deadline_exceeded"] += 1
+                raise error
+            self.stats["retries"] += 1
+            time.sleep(delay)
+
+    def run_in_slot(self, func):
+        try:
+            return func()
+        finally:
+            self.slots.release()
+
+
+def prompt_key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def run_key(run_manager) -> Optional[str]:
+    """Part of the prompt key that keeps a run with callback handlers to itself.
+
+    A coalesced follower gets the leader's result but none of its callback
+    events (streamed tokens), so such runs are only coalesced with themselves.
+    """
+    if run_manager is not None and run_manager.handlers:
+        return str(run_manager.run_id)
+    return None
+
+
+class GatewayChatModel(BaseChatModel):
+    """Chat model wrapper that sends every generation through the gateway"""
+    model: BaseChatModel
+    gateway: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return f"gateway-{self.model._llm_type}"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        key = prompt_key(
+            self.model._identifying_params, [(m.type, m.content) for m in messages], stop, kwargs,
+            run_key(run_manager)
+        )
+        return (self.gateway or llm_gateway).call(
+            key, lambda: self.model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+        )
+
+
+class GatewayLLM(LLM):
+    """Completion-model wrapper that sends every call through the gateway"""
+    model: Any
+    gateway: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return f"gateway-{self.model._llm_type}"
+
+    def _call(self, prompt: str, stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> str:
+        key = prompt_key(self.model._identifying_params, prompt, stop, kwargs, run_key(run_manager))
+        # The inner model reports to this run, as GatewayChatModel's does
+        return (self.gateway or llm_gateway).call(
+            key, lambda: self.model._call(prompt, stop=stop, run_manager=run_manager, **kwargs)
+        )
+
+
+# Shared by every session, agent and tool in the process
+llm_gateway = LLMGateway()
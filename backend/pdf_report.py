@@ -0,0 +1,241 @@
+import copy
+
+from reportlab.lib.pagesizes import letter
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+from fragments import report_fragments
+
+# PDF Report Generator
+class PDFReport:
+    def __init__(self):
+        self.elements = []
+        self.styles = getSampleStyleSheet()
+        
+        # Add custom styles
+        self.styles.add(ParagraphStyle(
+            name='CustomTitle',
+            parent=self.styles['Heading1'],
+            fontSize=16,
+            alignment=1,  # Center
+            textColor=colors.darkblue
+        ))
+        
+        self.styles.add(ParagraphStyle(
+            name='Section',
+            parent=self.styles['Heading2'],
+            fontSize=12,
+            textColor=colors.black
+        ))
+        
+        self.styles.add(ParagraphStyle(
+            name='Content',
+            parent=self.styles['Normal'],
+            fontSize=10,
+            textColor=colors.black
+        ))
+    
+    def add_title(self, title):
+        self.elements.append(Paragraph(title, self.styles['CustomTitle']))
+        self.elements.append(Spacer(1, 12))
+    
+    def add_section(self, title):
+        self.elements.append(Paragraph(title, self.styles['Section']))
+        self.elements.append(Spacer(1, 6))
+    
+    def add_content(self, content):
+        self.elements.append(Paragraph(content, self.styles['Content']))
+        self.elements.append(Spacer(1, 3))
+    
+    def add_store_info(self, store_data):
+        self.add_section("Store Information")
+        for field, value in store_data.items():
+            self.add_content(f"<b>{field}:</b> {value}")
+    
+    def add_survey_responses(self, answers):
+        self.add_section("Survey Responses")
+        for question, answer in answers.items():
+            self.add_content(f"<b>Q:</b> {question}")
+            self.add_content(f"<b>A:</b> {answer}")
+            self.elements.append(Spacer(1, 3))
+    
+    def add_quick_report(self, report, store_data, answers):
+        self.add_store_info(store_data)
+        self.add_survey_responses(answers)
+        
+        self.add_section("Quick Analysis Summary")
+        self.add_content(report['risk_summary'])
+        
+        self.add_section("Identified Risks")
+        risks_text = ", ".join(report['identified_risks'])
+        self.add_content(risks_text)
+        
+        self.add_section("Available Solutions")
+        solutions_text = ", ".join(report['unique_solutions'])
+        self.add_content(solutions_text)
+    
+    def add_detailed_report(self, report, store_data, answers, kb_version=None):
+        self.add_store_info(store_data)
+        self.add_survey_responses(answers)
+        
+        solutions = report['solutions']
+        for risk_data in report['identified_risks']:
+            if kb_version is None:
+                self.elements.extend(self.render_risk(risk_data, solutions))
+                continue
+            
+            template = report_fragments.get(
+                kb_version, ('risk_pdf', risk_data['risk_type']),
+                lambda: self.render_risk(risk_data, solutions)
+            )
+            # Flowables are wrapped per document, so each report gets its own copies
+            self.elements.extend(copy.copy(flowable) for flowable in template)
+    
+    def render_risk(self, risk_data, solutions):
+        """Flowables for one risk; they depend only on the knowledge base"""
+        elements, self.elements = self.elements, []
+        try:
+            self.add_section(f"Risk: {risk_data['risk_type']}")
+            
+            mitigations = risk_data['mitigations']
+            
+            # Add Mitigations
+            self.add_section("Mitigation Steps")
+            for category, items in mitigations.items():
+                if items:
+                    category_text = f"<b>{category.title()}:</b> {', '.join(items)}"
+                    self.add_content(category_text)
+            
+            # Add Implementation Details
+            self.add_section("Implementation Details")
+            for solution_id in risk_data['solution_ids']:
+                details = solutions.get(solution_id)
+                if details:
+                    self.add_content(f"<b>Solution: {details['name']}</b>")
+                    if details['use_case']:
+                        self.add_content(f"<b>Use Case:</b> {details['use_case']}")
+                    if details['links']:
+                        self.add_content(f"<b>Reference Links:</b> {details['links']}")
+                    if details['partners']:
+                        self.add_content(f"<b>Partners:</b> {details['partners']}")
+                    if details['data_format']:
+                        self.add_content(f"<b>Data Format:</b> {details['data_format']}")
+                    if details['immediate_actions']:
+                        self.add_content(f"<b>Immediate Actions:</b> {', '.join(details['immediate_actions'])}")
+                    if details['data_collation']:
+                        self.add_content(f"<b>Data Collation:</b> {', '.join(details['data_collation'])}")
+                    if details['dashboard']:
+                        self.add_content(f"<b>Dashboard Features:</b> {', '.join(details['dashboard'])}")
+                    if details['wearable']:
+                        self.add_content(f"<b>Wearable Features:</b> {', '.join(details['wearable'])}")
+                    if details['mobile']:
+                        self.add_content(f"<b>Mobile Features:</b> {', '.join(details['mobile'])}")
+                    if details['soc']:
+                        self.add_content(f"<b>SOC Features:</b> {', '.join(details['soc'])}")
+                    if details['audio_visual']:
+                        self.add_content(f"<b>Audio/Visual Features:</b> {', '.join(details['audio_visual'])}")
+                    self.elements.append(Spacer(1, 6))
+            return self.elements
+        finally:
+            self.elements = elements
+    
+    def add_area_analysis_detailed(self, area_data):
+        """Add detailed area analysis to the PDF"""
+        if not area_data or not area_data.get('success', False):
+            self.add_section("Area Analysis")
+            self.add_content("Area analysis data not available.")
+            return
+            
+        self.add_section("AREA ANALYSIS")
+        
+        # Location info
+        if 'location' in area_data:
+            self.add_content(f"<b>Location:</b> {area_data['location'].get('formatted_address', 'Address not available')}")
+            
+        # Population info
+        if 'population' in area_data:
+            self.add_section("Population Demographics")
+            pop = area_data['population']
+            self.add_content(f"<b>Density:</b> {pop.get('density', 'Unknown')}")
+            self.add_content(f"<b>Estimated Population:</b> {pop.get('estimated_population', 'Unknown')}")
+            
+        # Student population
+        if 'student_population' in area_data:
+            students = area_data['student_population']
+            self.add_content(f"<b>Student Population:</b> {students.get('estimated_students', 'Unknown')}")
+            self.add_content(f"<b>Universities nearby:</b> {students.get('universities', 0)}")
+            self.add_content(f"<b>Colleges nearby:</b> {students.get('colleges', 0)}")
+        
+        # Schools
+        if 'schools' in area_data and area_data['schools']:
+            self.add_section("Educational Institutions Nearby")
+            for i, school in enumerate(area_data['schools'][:5], 1):  # Top 5 schools
+                self.add_content(f"{i}. <b>{school['name']}</b> - {school['vicinity']}")
+                
+        # Retail areas
+        if 'retail_areas' in area_data and area_data['retail_areas']:
+            self.add_section("Retail Areas Nearby")
+            for i, retail in enumerate(area_data['retail_areas'][:5], 1):  # Top 5 retail areas
+                self.add_content(f"{i}. <b>{retail['name']}</b> - {retail['vicinity']}")
+                
+        # Transport hubs
+        if 'transport' in area_data:
+            self.add_section("Transport Infrastructure")
+            
+            if area_data['transport']['train_stations']:
+                self.add_content("<b>Rail Stations:</b>")
+                for i, station in enumerate(area_data['transport']['train_stations'], 1):
+                    self.add_content(f"{i}. <b>{station['name']}</b> - {station['vicinity']}")
+                    
+            if area_data['transport']['bus_stations']:
+                self.add_content("<b>Bus Stations:</b>")
+                for i, station in enumerate(area_data['transport']['bus_stations'], 1):
+                    self.add_content(f"{i}. <b>{station['name']}</b> - {station['vicinity']}")
+                    
+        # Major junctions
+        if 'major_junctions' in area_data and area_data['major_junctions']:
+            self.add_section("Major Road Junctions")
+            for i, junction in enumerate(area_data['major_junctions'], 1):
+                self.add_content(f"{i}. <b>{junction['name']}</b> - {junction['vicinity']}")
+    
+    def add_area_analysis_quick(self, area_data):
+        """Add summarized area analysis to the quick PDF report"""
+        if not area_data or not area_data.get('success', False):
+            self.add_section("Area Analysis")
+            self.add_content("Area analysis data not available.")
+            return
+            
+        self.add_section("AREA ANALYSIS SUMMARY")
+        
+        # Location and Population Summary
+        if 'location' in area_data:
+            self.add_content(f"<b>Location:</b> {area_data['location'].get('formatted_address', 'Address not available')}")
+            
+        if 'population' in area_data:
+            self.add_content(f"<b>Population Density:</b> {area_data['population'].get('density', 'Unknown')}")
+            
+        # Count summaries
+        school_count = len(area_data.get('schools', []))
+        retail_count = len(area_data.get('retail_areas', []))
+        bus_count = len(area_data.get('transport', {}).get('bus_stations', []))
+        train_count = len(area_data.get('transport', {}).get('train_stations', []))
+        
+        self.add_content("<b>Nearby Points of Interest:</b>")
+        self.add_content(f"• <b>Schools:</b> {school_count}")
+        self.add_content(f"• <b>Retail Areas:</b> {retail_count}")
+        self.add_content(f"• <b>Train Stations:</b> {train_count}")
+        self.add_content(f"• <b>Bus Stations:</b> {bus_count}")
+        
+        if 'student_population' in area_data:
+            self.add_content(f"• <b>Student Population:</b> {area_data['student_population'].get('estimated_students', 'Unknown')}")
+    
+    def generate_pdf(self, filename):
+        """Generate PDF file with the given filename or file-like object"""
+        try:
+            doc = SimpleDocTemplate(filename, pagesize=letter)
+            doc.build(self.elements)
+            return True
+        except Exception as e:
+            print(f"Error generating PDF: {str(e)}")
+            return False
@@ -0,0 +1,197 @@
+import threading
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+# Store attributes the estate cubes are keyed on
+GROUP_FIELDS = ["Store Format", "Location Footprint"]
+
+# Area-analysis counts rolled up per group
+AREA_COUNTS = {
+    'schools': lambda area: len(area.get('schools', [])),
+    'retail_areas': lambda area: len(area.get('retail_areas', [])),
+    'bus_stations': lambda area: len(area.get('transport', {}).get('bus_stations', [])),
+    'train_stations': lambda area: len(area.get('transport', {}).get('train_stations', [])),
+    'major_junctions': lambda area: len(area.get('major_junctions', []))
+}
+
+
+# Answers accepted from imported assessments, as in the chat (case-insensitive)
+ANSWER_VALUES = {'Y', 'N', 'YES', 'NO'}
+
+
+def assessment_error(assessments, questions=None) -> Optional[str]:
+    """Why a batch of assessments cannot be ingested or exported, or None if it can.
+
+    With questions (the knowledge base's question IDs), every answer must be to
+    a known question and be "Yes" or "No".
+    """
+    if not isinstance(assessments, list):
+        return 'assessments must be a list'
+    for assessment in assessments:
+        if not isinstance(assessment, dict) or not assessment.get('id') or 'answers' not in assessment:
+            return 'Each assessment needs an id and answers'
+        if not isinstance(assessment['answers'], dict):
+            return f"Answers for {assessment['id']} must be an object"
+        if questions is not None:
+            for question, answer in assessment['answers'].items():
+                if question not in questions:
+                    return f"Unknown question in answers for {assessment['id']}: {question}"
+                if not isinstance(answer, str) or answer.upper() not in ANSWER_VALUES:
+                    return f"Answer to {question!r} for {assessment['id']} must be Yes or No"
+        if not isinstance(assessment.get('store_data') or {}, dict):
+            return f"Store data for {assessment['id']} must be an object"
+        if not isinstance(assessment.get('area_data') or {}, dict):
+            return f"Area data for {assessment['id']} must be an object"
+    return None
+
+
+class PortfolioAnalysis:
+    """Estate-wide risk and solution aggregates over many completed assessments.
+
+    Every assessment is folded into cubes keyed by (Store Format, Location
+    Footprint) when it is ingested, so dashboard queries only roll up the
+    pre-aggregated cells and never revisit individual stores. Re-ingesting an
+    assessment replaces its previous contribution.
+    """
+
+    def __init__(self, data_processor):
+        self.data_processor = data_processor
+        self.lock = threading.Lock()
+        self.assessments = {}
+        self.store_cube = Counter()     # group -> stores
+        self.risk_cube = Counter()      # (group, risk) -> stores with the risk
+        self.solution_cube = Counter()  # (group, solution) -> stores needing it
+        self.area_cube = Counter()      # (group, area count) -> total across stores
+
+    @staticmethod
+    def group_key(store_data: Dict[str, Any]) -> tuple:
+        values = []
+        for field in GROUP_FIELDS:
+            value = str(store_data.get(field, '') or '').strip()
+            values.append(value.title() if value else 'Unknown')
+        return tuple(values)
+
+    def summarize(self, store_data, answers, area_data=None, data_processor=None) -> Dict[str, Any]:
+        data_processor = data_processor or self.data_processor
+        risks = set(data_processor.analyze_risks(answers))
+        solutions = set()
+        for risk in risks:
+            solutions.update(data_processor.risk_solutions.get(risk, ()))
+
+        area_counts = {}
+        if area_data and area_data.get('success', False):
+            area_counts = {name: count(area_data) for name, count in AREA_COUNTS.items()}
+
+        return {
+            'group': self.group_key(store_data),
+            'risks': risks,
+            'solutions': solutions,
+            'area_counts': area_counts
+        }
+
+    @staticmethod
+    def bump(cube, key, amount):
+        cube[key] += amount
+        # Drop emptied cells so roll-ups only walk live data
+        if cube[key] == 0:
+            del cube[key]
+
+    def apply(self, summary, sign):
+        group = summary['group']
+        self.bump(self.store_cube, group, sign)
+        for risk in summary['risks']:
+            self.bump(self.risk_cube, (group, risk), sign)
+        for solution in summary['solutions']:
+            self.bump(self.solution_cube, (group, solution), sign)
+        for name, count in summary['area_counts'].items():
+            if count:
+                self.bump(self.area_cube, (group, name), sign * count)
+
+    def ingest(self, assessment_id, store_data, answers, area_data=None, data_processor=None):
+        summary = self.summarize(store_data or {}, answers or {}, area_data, data_processor)
+        with self.lock:
+            previous = self.assessments.get(assessment_id)
+            if previous:
+                self.apply(previous, -1)
+            self.assessments[assessment_id] = summary
+            self.apply(summary, 1)
+
+    def ingest_session(self, session):
+        # The session's own knowledge-base version, which its packed answers index into
+        self.ingest(session.session_id, session.store_info.store_data, session.answers, session.area_data,
+                    session.data_processor)
+
+    def remove(self, assessment_id):
+        with self.lock:
+            previous = self.assessments.pop(assessment_id, None)
+            if previous:
+                self.apply(previous, -1)
+
+    def resolve_group_by(self, group_by: Optional[List[str]]) -> List[int]:
+        if not group_by:
+            return []
+        unknown = [field for field in group_by if field not in GROUP_FIELDS]
+        if unknown:
+            raise ValueError(f"Cannot group by {', '.join(unknown)}; expected one of {', '.join(GROUP_FIELDS)}")
+        return [GROUP_FIELDS.index(field) for field in group_by]
+
+    @staticmethod
+    def label(group, indexes) -> str:
+        return " / ".join(group[i] for i in indexes) if indexes else "All Stores"
+
+    def risk_heatmap(self, group_by: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Share of stores in each group that have each risk"""
+        indexes = self.resolve_group_by(group_by if group_by is not None else GROUP_FIELDS)
+        with self.lock:
+            stores = Counter()
+            for group, count in self.store_cube.items():
+                stores[self.label(group, indexes)] += count
+
+            risks = {}
+            for (group, risk), count in self.risk_cube.items():
+                cell = risks.setdefault(self.label(group, indexes), Counter())
+                cell[risk] += count
+
+            area = {}
+            for (group, name), count in self.area_cube.items():
+                cell = area.setdefault(self.label(group, indexes), Counter())
+                cell[name] += count
+
+        groups = {}
+        for label, store_count in stores.items():
+            groups[label] = {
+                'stores': store_count,
+                'risks': {
+                    risk: {'count': count, 'frequency': round(count / store_count, 4)}
+                    for risk, count in risks.get(label, Counter()).most_common()
+                },
+                'average_area_counts': {
+                    name: round(total / store_count, 2)
+                    for name, total in area.get(label, Counter()).items()
+                }
+            }
+
+        return {
+            'group_by': [GROUP_FIELDS[i] for i in indexes],
+            'total_stores': sum(stores.values()),
+            'groups': groups
+        }
+
+    def solution_demand(self, group_by: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Number of stores needing each solution, estate-wide or per group"""
+        indexes = self.resolve_group_by(group_by)
+        with self.lock:
+            demand = {}
+            for (group, solution), count in self.solution_cube.items():
+                cell = demand.setdefault(self.label(group, indexes), Counter())
+                cell[solution] += count
+            total_stores = sum(self.store_cube.values())
+
+        return {
+            'group_by': [GROUP_FIELDS[i] for i in indexes],
+            'total_stores': total_stores,
+            'groups': {
+                label: [{'solution': solution, 'stores': count} for solution, count in cell.most_common()]
+                for label, cell in demand.items()
+            }
+        }
@@ -0,0 +1,166 @@
+"""Deterministic fast path for support-bot questions that are table lookups.
+
+Questions like "How much does CCTV cost?" or "What mitigations exist for
+theft?" are answered straight from the workbook's solution, cost and
+mitigation columns in milliseconds. Anything else returns None and falls
+through to the LLM agent.
+"""
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+COST_INTENT = re.compile(r"\b(cost|costs|price|prices|pricing|how much)\b")
+MITIGATION_INTENT = re.compile(r"\b(mitigat\w*|prevent\w*|solutions?|tackle|counter)\b")
+
+# Words that never identify a solution or risk on their own
+STOPWORDS = {
+    "the", "and", "for", "with", "from", "what", "how", "does", "are", "is", "of", "to", "in",
+    "a", "an", "w", "o", "we", "can", "our", "there", "exist", "available", "much", "do", "it",
+    "risk", "cost", "price", "pricing", "mitigation", "mitigate", "solution", "prevention", "implementation"
+}
+
+# Rows listed per answer; more matches means the question is too broad to be a lookup
+MAX_ROWS = 8
+
+
+def tokens(text: str) -> set:
+    words = set()
+    for word in re.findall(r"[a-z0-9]+", str(text).lower()):
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        if word not in STOPWORDS:
+            words.add(word)
+    return words
+
+
+class RouteMetrics:
+    """Share of support-bot traffic answered by the fast path, per intent"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.fast_path_seconds = 0.0
+
+    def record(self, route: str, seconds: float = 0.0):
+        with self.lock:
+            self.counts[route] += 1
+            self.counts["total"] += 1
+            if route != "agent":
+                self.counts["fast_path"] += 1
+                self.fast_path_seconds += seconds
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            total = self.counts["total"]
+            fast = self.counts["fast_path"]
+            return {
+                "total": total,
+                "fast_path": fast,
+                "fast_path_share": fast / total if total else 0.0,
+                "by_route": {k: v for k, v in self.counts.items() if k not in ("total", "fast_path")},
+                "avg_fast_path_ms": 1000 * self.fast_path_seconds / fast if fast else 0.0
+            }
+
+
+class QueryRouter:
+    """Answers cost and mitigation lookups from the uploaded workbook"""
+
+    def __init__(self, metrics: Optional[RouteMetrics] = None):
+        self.metrics = metrics or route_metrics
+        self.costs = []        # (key token sets, solution, cost)
+        self.mitigations = []  # (key token sets, risk, bucket, {column: value})
+
+    @classmethod
+    def from_excel(cls, excel_file, metrics: Optional[RouteMetrics] = None):
+        router = cls(metrics)
+        xl = pd.ExcelFile(excel_file)
+        for sheet_name in xl.sheet_names:
+            router.add_sheet(xl.parse(sheet_name))
+        return router
+
+    @staticmethod
+    def find_column(df, name):
+        for column in df.columns:
+            if str(column).strip().lower() == name:
+                return column
+        return None
+
+    def add_sheet(self, df):
+        solution = self.find_column(df, "solution")
+        cost = self.find_column(df, "cost")
+        if solution is not None and cost is not None:
+            for _, row in df[[solution, cost]].dropna().iterrows():
+                self.costs.append(([tokens(row[solution])], str(row[solution]).strip(), str(row[cost]).strip()))
+
+        risk = self.find_column(df, "risk type")
+        bucket = self.find_column(df, "risk bucket")
+        mitigation_columns = [c for c in df.columns if "mitigation" in str(c).lower()]
+        if risk is not None and mitigation_columns:
+            for _, row in df.iterrows():
+                if pd.isna(row[risk]):
+                    continue
+                risk_bucket = str(row[bucket]).strip() if bucket is not None and pd.notna(row[bucket]) else ""
+                values = {c: str(row[c]).strip() for c in mitigation_columns if pd.notna(row[c]) and str(row[c]).strip()}
+                if not values:
+                    # Nothing to answer with; a bare heading would only add noise
+                    continue
+                self.mitigations.append(
+                    ([tokens(row[risk]), tokens(risk_bucket)], str(row[risk]).strip(), risk_bucket, values)
+                )
+
+    @staticmethod
+    def best_matches(question_tokens: set, rows: List) -> List:
+        """Rows whose name (or bucket) shares the most words with the question"""
+        scored = []
+        for row in rows:
+            matched = max(len(keys & question_tokens) for keys in row[0])
+            if matched:
+                scored.append((matched, row))
+        if not scored:
+            return []
+        best = max(matched for matched, _ in scored)
+        return [row for matched, row in scored if matched == best]
+
+    def answer_cost(self, question_tokens: set) -> Optional[str]:
+        rows = self.best_matches(question_tokens, self.costs)
+        if not rows or len(rows) > MAX_ROWS:
+            return None
+        lines = dict.fromkeys(f"**{name}**: {cost}" for _, name, cost in rows)
+        return "\n".join(lines)
+
+    def answer_mitigation(self, question_tokens: set) -> Optional[str]:
+        rows = self.best_matches(question_tokens, self.mitigations)
+        if not rows or len(rows) > MAX_ROWS:
+            return None
+        sections = []
+        for _, risk, bucket, values in rows:
+            heading = f"**{risk}**" + (f" ({bucket})" if bucket else "")
+            sections.append("\n".join([heading] + [f"- {column}: {value}" for column, value in values.items()]))
+        return "\n\n".join(dict.fromkeys(sections))
+
+    def route(self, question: str) -> Optional[str]:
+        """Answer from the workbook, or None if the agent should handle it"""
+        start = time.perf_counter()
+        text = question.lower()
+        question_tokens = tokens(question)
+        answer, intent = None, "agent"
+
+        # A cost question with no matching cost row goes to the agent; a mitigation
+        # list would not answer it
+        if COST_INTENT.search(text):
+            answer = self.answer_cost(question_tokens)
+            intent = "cost"
+        elif MITIGATION_INTENT.search(text):
+            answer = self.answer_mitigation(question_tokens)
+            intent = "mitigation"
+
+        self.metrics.record(intent if answer is not None else "agent", time.perf_counter() - start)
+        return answer
+
+
+# Process-wide, so the share covers every session and workbook
+route_metrics = RouteMetrics()
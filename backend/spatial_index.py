@@ -0,0 +1,279 @@
+import math
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+EARTH_RADIUS_M = 6371000
+
+# Grid cell size in degrees of latitude (~5.5 km)
+CELL_SIZE_DEG = 0.05
+
+# How long fetched results stay valid, per Places type (seconds)
+FRESHNESS_TTL = {
+    'school': 30 * 86400,
+    'shopping_mall': 7 * 86400,
+    'department_store': 7 * 86400,
+    'store': 7 * 86400,
+    'bus_station': 30 * 86400,
+    'train_station': 30 * 86400,
+    'intersection': 90 * 86400
+}
+DEFAULT_TTL = 7 * 86400
+
+# Share of a query disk's sample points that may be uncovered and still be
+# answered locally. A last-resort allowance for sampling error along the rims
+# of fetched circles; uncovered parts are otherwise fetched
+COVERAGE_TOLERANCE = 0.02
+
+# Sample points per radius used to estimate how much of a disk is covered
+SAMPLE_STEPS = 8
+
+# Nearby search returns at most 3 pages of 20; a fetch that reaches this may
+# have been cut short, so it does not count as covering its circle
+PLACES_RESULT_CAP = 60
+PLACES_PAGE_SIZE = 20
+
+# Indexed places kept before the oldest fetches are evicted
+MAX_PLACES = 200000
+
+# Inserts between sweeps of expired places and fetched circles
+SWEEP_EVERY = 500
+
+
+def haversine(lat1, lng1, lat2, lng2):
+    """Great-circle distance in meters"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def offset(lat, lng, north_m, east_m):
+    """Move a point by the given meters north and east"""
+    dlat = math.degrees(north_m / EARTH_RADIUS_M)
+    dlng = math.degrees(east_m / (EARTH_RADIUS_M * max(math.cos(math.radians(lat)), 1e-6)))
+    return lat + dlat, lng + dlng
+
+
+class PlaceIndex:
+    """Process-wide grid index of Places results with per-type freshness.
+
+    Every complete remote query is recorded as a fetched circle, with how many
+    places it returned. A radius query that is covered by fresh fetched
+    circles is answered from the grid; otherwise the uncovered remainder is
+    fetched as smaller circles when that takes no more requests than the disk.
+    """
+
+    def __init__(self, ttl=None, cell_size=CELL_SIZE_DEG, max_places=MAX_PLACES):
+        self.ttl = dict(FRESHNESS_TTL, **(ttl or {}))
+        self.cell_size = cell_size
+        self.max_places = max_places
+        self.lock = threading.Lock()
+        self.cells = {}       # (key, cell) -> {place_id: (lat, lng, fetched_at, place)}
+        self.coverage = {}    # key -> [(lat, lng, radius, fetched_at, places returned)]
+        self.size = 0         # places across all cells
+        self.inserts = 0
+        self.stats = {'local_queries': 0, 'remote_queries': 0}
+
+    def ttl_for(self, key):
+        return self.ttl.get(key[0], DEFAULT_TTL)
+
+    def cell_of(self, lat, lng):
+        return (math.floor(lat / self.cell_size), math.floor(lng / self.cell_size))
+
+    def is_covered(self, circles, lat, lng, radius=0):
+        for c_lat, c_lng, c_radius, *_ in circles:
+            if haversine(lat, lng, c_lat, c_lng) + radius <= c_radius:
+                return True
+        return False
+
+    def uncovered_regions(self, key, lat, lng, radius) -> List[Tuple[float, float, float]]:
+        """Circles that still need a remote query to cover the requested one.
+
+        Returns nothing when the disk is covered by fresh fetches. Otherwise the
+        uncovered sample points are covered by circles of about half the radius,
+        which are returned if fetching them takes no more requests than the
+        full disk would; if not, the full disk is returned, so a query never
+        costs more than before.
+        """
+        now = time.time()
+        with self.lock:
+            # Forget expired fetches
+            ttl = self.ttl_for(key)
+            self.coverage[key] = [c for c in self.coverage.get(key, []) if now - c[3] < ttl]
+            # Only fetched circles that overlap the disk matter
+            circles = [
+                c for c in self.coverage[key]
+                if haversine(lat, lng, c[0], c[1]) < radius + c[2]
+            ]
+
+        if not circles:
+            return [(lat, lng, radius)]
+        if self.is_covered(circles, lat, lng, radius):
+            return []
+
+        # Sample the disk on a regular grid and find the uncovered points, as
+        # (north, east) offsets in meters
+        step = radius / SAMPLE_STEPS
+        samples, uncovered = 0, []
+        for i in range(-SAMPLE_STEPS, SAMPLE_STEPS + 1):
+            for j in range(-SAMPLE_STEPS, SAMPLE_STEPS + 1):
+                if i * i + j * j > SAMPLE_STEPS * SAMPLE_STEPS:
+                    continue
+                samples += 1
+                if not self.is_covered(circles, *offset(lat, lng, i * step, j * step)):
+                    uncovered.append((i * step, j * step))
+
+        if len(uncovered) <= COVERAGE_TOLERANCE * samples:
+            return []
+
+        regions = [
+            (*offset(lat, lng, north, east), min(sub_radius, radius))
+            for north, east, sub_radius in self.cover_points(uncovered, radius / 2, step)
+        ]
+        # Ties go to the smaller circles: they return fewer places and are less
+        # likely to be cut short at the cap
+        density = self.density(circles)
+        if sum(self.requests(density, r) for _, _, r in regions) <= self.requests(density, radius):
+            return regions
+        return [(lat, lng, radius)]
+
+    @staticmethod
+    def cover_points(points, reach, pad) -> List[Tuple[float, float, float]]:
+        """Greedy cover of (north, east) points by circles of about reach.
+
+        Each circle is seeded at the point with the most others within reach and
+        encloses them, padded so the gaps between sample points are covered too.
+        """
+        circles = []
+        remaining = list(points)
+        while remaining:
+            seed = max(remaining, key=lambda p: sum(math.hypot(p[0] - q[0], p[1] - q[1]) <= reach for q in remaining))
+            group = [q for q in remaining if math.hypot(seed[0] - q[0], seed[1] - q[1]) <= reach]
+            remaining = [q for q in remaining if math.hypot(seed[0] - q[0], seed[1] - q[1]) > reach]
+            mid_north = (min(q[0] for q in group) + max(q[0] for q in group)) / 2
+            mid_east = (min(q[1] for q in group) + max(q[1] for q in group)) / 2
+            enclosing = max(math.hypot(q[0] - mid_north, q[1] - mid_east) for q in group)
+            circles.append((mid_north, mid_east, enclosing + pad))
+        return circles
+
+    @staticmethod
+    def density(circles) -> float:
+        """Places per square meter returned by fetched circles"""
+        area = sum(math.pi * c[2] ** 2 for c in circles)
+        return sum(c[4] for c in circles) / area if area else 0.0
+
+    @staticmethod
+    def requests(density, radius) -> int:
+        """Result pages needed to fetch every place in a circle at this density"""
+        expected = density * math.pi * radius ** 2
+        return max(1, math.ceil(expected / PLACES_PAGE_SIZE))
+
+    def insert(self, key, lat, lng, radius, places, complete=True):
+        """Index fetched places; only a complete fetch marks its circle covered"""
+        now = time.time()
+        with self.lock:
+            if complete:
+                self.coverage.setdefault(key, []).append((lat, lng, radius, now, len(places)))
+            for place in places:
+                point = place.get('geometry', {}).get('location')
+                if not point:
+                    continue
+                place_id = place.get('place_id') or f"{place.get('name')}@{point['lat']},{point['lng']}"
+                cell = self.cells.setdefault((key, self.cell_of(point['lat'], point['lng'])), {})
+                if place_id not in cell:
+                    self.size += 1
+                cell[place_id] = (point['lat'], point['lng'], now, place)
+
+            self.inserts += 1
+            if self.inserts % SWEEP_EVERY == 0 or self.size > self.max_places:
+                self.sweep(now)
+
+    def sweep(self, now):
+        """Drop expired entries, then the oldest fetches while over max_places.
+
+        A circle and the places it returned share one fetched_at, and a later
+        complete fetch re-stamps every place inside its circle. Evicting all
+        circles and places fetched up to a cutoff therefore never leaves a
+        circle marked covered without its places. Called with the lock held.
+        """
+        for key in list(self.coverage):
+            ttl = self.ttl_for(key)
+            self.coverage[key] = [c for c in self.coverage[key] if now - c[3] < ttl]
+            if not self.coverage[key]:
+                del self.coverage[key]
+        self.drop_places(lambda key, fetched_at: now - fetched_at >= self.ttl_for(key))
+
+        if self.size > self.max_places:
+            # Keep the newest 90% so eviction is not rerun on every insert
+            stamps = sorted(entry[2] for cell in self.cells.values() for entry in cell.values())
+            cutoff = stamps[len(stamps) - int(self.max_places * 0.9) - 1]
+            for key in list(self.coverage):
+                self.coverage[key] = [c for c in self.coverage[key] if c[3] > cutoff]
+                if not self.coverage[key]:
+                    del self.coverage[key]
+            self.drop_places(lambda key, fetched_at: fetched_at <= cutoff)
+
+    def drop_places(self, stale):
+        for cell_key in list(self.cells):
+            cell = self.cells[cell_key]
+            for place_id in [pid for pid, entry in cell.items() if stale(cell_key[0], entry[2])]:
+                del cell[place_id]
+                self.size -= 1
+            if not cell:
+                del self.cells[cell_key]
+
+    def search(self, key, lat, lng, radius) -> List[Dict[str, Any]]:
+        """Fresh indexed places within radius, nearest first"""
+        now = time.time()
+        ttl = self.ttl_for(key)
+        lat_span = math.degrees(radius / EARTH_RADIUS_M)
+        lng_span = math.degrees(radius / (EARTH_RADIUS_M * max(math.cos(math.radians(lat)), 1e-6)))
+        min_cell = self.cell_of(lat - lat_span, lng - lng_span)
+        max_cell = self.cell_of(lat + lat_span, lng + lng_span)
+
+        found = []
+        with self.lock:
+            for x in range(min_cell[0], max_cell[0] + 1):
+                for y in range(min_cell[1], max_cell[1] + 1):
+                    cell = self.cells.get((key, (x, y)))
+                    if not cell:
+                        continue
+                    for place_id in list(cell):
+                        p_lat, p_lng, fetched_at, place = cell[place_id]
+                        if now - fetched_at >= ttl:
+                            del cell[place_id]
+                            self.size -= 1
+                            continue
+                        distance = haversine(lat, lng, p_lat, p_lng)
+                        if distance <= radius:
+                            found.append((distance, place))
+
+        found.sort(key=lambda item: item[0])
+        return [place for _, place in found]
+
+    def query(self, location, radius, place_type, keyword,
+              fetch: Callable[[float, float, float], Optional[List[Dict[str, Any]]]]):
+        """Answer a radius query, fetching only the uncovered remainder remotely.
+
+        fetch(lat, lng, radius) returns the remote results, or None on failure
+        so the area is not recorded as covered. Results at the Places cap may be
+        truncated, so they are indexed but the area is not recorded as covered.
+        """
+        key = (place_type, keyword or '')
+        lat, lng = location['lat'], location['lng']
+
+        regions = self.uncovered_regions(key, lat, lng, radius)
+        for sub_lat, sub_lng, sub_radius in regions:
+            places = fetch(sub_lat, sub_lng, sub_radius)
+            if places is not None:
+                self.insert(key, sub_lat, sub_lng, sub_radius, places, complete=len(places) < PLACES_RESULT_CAP)
+
+        with self.lock:
+            self.stats['remote_queries' if regions else 'local_queries'] += 1
+        return self.search(key, lat, lng, radius)
+
+
+# Shared across sessions so neighbouring stores reuse each other's results
+place_index = PlaceIndex()
@@ -0,0 +1,25 @@
+"""Write-side plumbing for responses streamed while a file is being written."""
+import io
+
+
+class ChunkSink(io.RawIOBase):
+    """Write-only sink that hands out what was written since the last drain.
+
+    Lets a writer that expects a file (zipfile, a Parquet writer) feed a
+    streamed response one chunk at a time.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
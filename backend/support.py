@@ -1,79 +1,80 @@
 import streamlit as st
-import pandas as pd
 import os
 from langchain.embeddings import HuggingFaceEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.vectorstores import FAISS
 from langchain.memory import ConversationBufferMemory
 from langchain.chains import ConversationalRetrievalChain
 from langchain.llms import Mistral
-from langchain.schema import Document
 from langchain.callbacks.streaming_stdout import StreamingStdOutCallbackHandler
 from langchain.agents import AgentExecutor, create_structured_chat_agent
 from langchain.tools import Tool
 import re
+import hashlib
+import io
+from chunking import CHUNK_TOKENS, load_sheets, pack_rows, row_chunks
+from ingestion import IngestionPipeline
+from query_router import QueryRouter, route_metrics
+from llm_gateway import GatewayLLM
 
 # Set up Mistral API key
 os.environ["MISTRAL_API_KEY"] = "zoVkipjGVY5dS06jFXYwsRnhl0NyvjpE"  # Replace with your API key
 
-# Initialize Mistral LLM
-llm = Mistral(
+# Initialize Mistral LLM; calls share the process-wide gateway's concurrency
+# limit, deadlines, retries and coalescing with every other session
+llm = GatewayLLM(model=Mistral(
     model="mistral-medium",  # or any model of your choice
     temperature=0.7,
     streaming=True,
     callbacks=[StreamingStdOutCallbackHandler()]
-)
-
-# Function to convert Excel data to documents
-def excel_to_documents(excel_file):
-    try:
-        # Read all sheets from the Excel file
-        xl = pd.ExcelFile(excel_file)
-        sheet_names = xl.sheet_names
-        
-        documents = []
-        
-        for sheet_name in sheet_names:
-            df = pd.read_excel(excel_file, sheet_name=sheet_name)
-            
-            # Convert each row to a document
-            for idx, row in df.iterrows():
-                # Convert row to string and clean it
-                content = f"Sheet: {sheet_name}\n"
-                for col, value in row.items():
-                    if pd.notna(value):  # Check if the value is not NaN
-                        content += f"{col}: {value}\n"
-                
-                # Create document with metadata
-                doc = Document(
-                    page_content=content,
-                    metadata={"source": f"{sheet_name}", "row": idx}
-                )
-                documents.append(doc)
-        
-        return documents
-    except Exception as e:
-        st.error(f"Error processing Excel file: {e}")
-        return []
-
-# Function to set up the vector database
-def setup_vectordb(documents):
-    # Initialize embeddings
-    embeddings = HuggingFaceEmbeddings(
+))
+
+# Embedding model, loaded once per process and shared by every browser session
+@st.cache_resource(show_spinner="Loading embedding model...")
+def load_embeddings():
+    return HuggingFaceEmbeddings(
         model_name="sentence-transformers/all-MiniLM-L6-v2"
     )
-    
-    # Split the documents
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=200
-    )
-    texts = text_splitter.split_documents(documents)
-    
-    # Create FAISS vector store
-    vectorstore = FAISS.from_documents(texts, embeddings)
-    
-    return vectorstore
+
+# Chunking: one document per row by default. SUPPORT_CHUNKING=packed packs
+# adjacent rows into chunks of SUPPORT_CHUNK_TOKENS that keep their row
+# numbers; its recall with the embedding model is still to be measured
+# (benchmarks/chunking_recall.py)
+def chunk_sheets(sheets):
+    if os.getenv("SUPPORT_CHUNKING", "rows") == "packed":
+        return pack_rows(sheets, int(os.getenv("SUPPORT_CHUNK_TOKENS", CHUNK_TOKENS)))
+    return row_chunks(sheets)
+
+# Workbooks whose index and lookup tables are kept in memory; the least
+# recently used is dropped when another is uploaded
+MAX_WORKBOOKS = int(os.getenv("SUPPORT_MAX_WORKBOOKS", "4"))
+
+# Background ingestion per workbook, keyed by content so reruns and other
+# sessions uploading the same file reuse it. The index type follows the corpus
+# size unless SUPPORT_INDEX_TYPE (auto/flat/hnsw/ivf) or
+# SUPPORT_INDEX_QUANTIZATION (none/sq8/pq) is set
+@st.cache_resource(show_spinner=False, max_entries=MAX_WORKBOOKS)
+def start_ingestion(file_hash, _file_bytes):
+    return IngestionPipeline(
+        io.BytesIO(_file_bytes),
+        load_sheets,
+        chunk_sheets,
+        load_embeddings(),
+        index_type=os.getenv("SUPPORT_INDEX_TYPE", "auto"),
+        quantization=os.getenv("SUPPORT_INDEX_QUANTIZATION") or None
+    ).start()
+
+# Lookup tables for the deterministic fast path, per workbook
+@st.cache_resource(show_spinner=False, max_entries=MAX_WORKBOOKS)
+def load_router(file_hash, _file_bytes):
+    return QueryRouter.from_excel(io.BytesIO(_file_bytes))
+
+# Progress of the background ingestion, refreshed without rerunning the page
+@st.fragment(run_every=1)
+def ingestion_progress(pipeline):
+    if pipeline.done:
+        # Rerun the whole page to swap the progress bar for the final status
+        st.rerun()
+    st.progress(pipeline.progress(), text=pipeline.status())
 
 # Custom tool for security survey responses
 def security_survey_tool(query):
@@ -127,61 +128,62 @@ if "agent" not in st.session_state:
 
 # Process uploaded file
 if uploaded_file:
-    with st.spinner("Processing Excel data..."):
-        # If we don't have documents or a new file is uploaded, process the file
-        if "documents" not in st.session_state or st.session_state.uploaded_file_name != uploaded_file.name:
-            st.session_state.uploaded_file_name = uploaded_file.name
-            documents = excel_to_documents(uploaded_file)
-            st.session_state.documents = documents
-            
-            # Set up vector database
-            vectorstore = setup_vectordb(documents)
-            st.session_state.vectorstore = vectorstore
-            
-            # Set up retriever
-            retriever = vectorstore.as_retriever(
-                search_kwargs={"k": 5}
-            )
-            st.session_state.retriever = retriever
-            
-            # Set up tools
-            tools = [
-                Tool(
-                    name="SecuritySurveyTool",
-                    func=security_survey_tool,
-                    description="Use this tool to get information about security survey questions and risks."
-                ),
-                Tool(
-                    name="RiskMitigationTool",
-                    func=risk_mitigation_tool,
-                    description="Use this tool to get specific mitigation strategies for security risks."
-                ),
-                Tool(
-                    name="SolutionCostTool",
-                    func=solution_cost_tool,
-                    description="Use this tool to get information about security solutions and their costs."
-                )
-            ]
-            
-            # Setup conversation memory
-            memory = ConversationBufferMemory(
-                memory_key="chat_history",
-                return_messages=True
-            )
-            
-            # Create the agent
-            agent = create_structured_chat_agent(llm, tools, "You are a helpful assistant specializing in security survey assessment.")
-            agent_executor = AgentExecutor.from_agent_and_tools(
-                agent=agent,
-                tools=tools,
-                memory=memory,
-                verbose=True,
-                handle_parsing_errors=True
+    file_bytes = uploaded_file.getvalue()
+    file_hash = hashlib.sha256(file_bytes).hexdigest()
+    pipeline = start_ingestion(file_hash, file_bytes)
+    router = load_router(file_hash, file_bytes)
+    
+    # Build the agent once per session and workbook; it searches the pipeline's
+    # index, which is usable while ingestion is still running
+    if st.session_state.get("file_hash") != file_hash:
+        st.session_state.file_hash = file_hash
+        st.session_state.uploaded_file_name = uploaded_file.name
+        st.session_state.retriever = pipeline
+        
+        # Set up tools
+        tools = [
+            Tool(
+                name="SecuritySurveyTool",
+                func=security_survey_tool,
+                description="Use this tool to get information about security survey questions and risks."
+            ),
+            Tool(
+                name="RiskMitigationTool",
+                func=risk_mitigation_tool,
+                description="Use this tool to get specific mitigation strategies for security risks."
+            ),
+            Tool(
+                name="SolutionCostTool",
+                func=solution_cost_tool,
+                description="Use this tool to get information about security solutions and their costs."
             )
-            
-            st.session_state.agent = agent_executor
-            
-            st.success("Excel data processed successfully!")
+        ]
+        
+        # Setup conversation memory
+        memory = ConversationBufferMemory(
+            memory_key="chat_history",
+            return_messages=True
+        )
+        
+        # Create the agent
+        agent = create_structured_chat_agent(llm, tools, "You are a helpful assistant specializing in security survey assessment.")
+        agent_executor = AgentExecutor.from_agent_and_tools(
+            agent=agent,
+            tools=tools,
+            memory=memory,
+            verbose=True,
+            handle_parsing_errors=True
+        )
+        
+        st.session_state.agent = agent_executor
+    
+    if pipeline.failed:
+        st.error(f"Error processing Excel file: {pipeline.error}")
+    elif pipeline.done:
+        st.success("Excel data processed successfully!")
+    else:
+        ingestion_progress(pipeline)
+        st.caption("You can start asking questions now; answers use the rows indexed so far.")
     
     # Display chat interface
     for message in st.session_state.messages:
@@ -201,15 +203,19 @@ if uploaded_file:
         with st.chat_message("assistant"):
             with st.spinner("Thinking..."):
                 try:
-                    # Get the agent response
-                    retriever = st.session_state.retriever
-                    response = st.session_state.agent.run(prompt)
+                    # Cost and mitigation lookups are answered straight from the sheet
+                    cleaned_response = router.route(prompt)
                     
-                    # Clean up any tool information in the response
-                    cleaned_response = re.sub(r'Action: .*?\n', '', response)
-                    cleaned_response = re.sub(r'Action Input: .*?\n', '', cleaned_response)
-                    cleaned_response = re.sub(r'Observation: .*?\n', '', cleaned_response)
-                    cleaned_response = cleaned_response.strip()
+                    if cleaned_response is None:
+                        # Get the agent response
+                        retriever = st.session_state.retriever
+                        response = st.session_state.agent.run(prompt)
+                        
+                        # Clean up any tool information in the response
+                        cleaned_response = re.sub(r'Action: .*?\n', '', response)
+                        cleaned_response = re.sub(r'Action Input: .*?\n', '', cleaned_response)
+                        cleaned_response = re.sub(r'Observation: .*?\n', '', cleaned_response)
+                        cleaned_response = cleaned_response.strip()
                     
                     st.markdown(cleaned_response)
                     
@@ -239,4 +245,13 @@ st.sidebar.markdown("""
 - What solutions are available for theft prevention?
 - How much does CCTV implementation cost?
 - What are the best practices for access control?
-""")
\ No newline at end of file
+""")
+
+# Share of questions answered without the LLM, across all sessions
+metrics = route_metrics.snapshot()
+if metrics["total"]:
+    st.sidebar.metric(
+        "Answered from the sheet",
+        f"{metrics['fast_path_share']:.0%}",
+        help=f"{metrics['fast_path']} of {metrics['total']} questions, {metrics['avg_fast_path_ms']:.1f} ms on average"
+    )
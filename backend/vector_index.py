@@ -0,0 +1,129 @@
+"""FAISS index selection for the support chatbot's knowledge base.
+
+A flat index is exact, but its memory and search time grow linearly with the
+corpus. Large workbooks therefore move to HNSW, and then to IVF. Vectors can
+be stored with scalar (SQ8) or product (PQ) quantization.
+benchmarks/ann_recall.py measures the recall/latency trade-off of each option.
+"""
+import math
+import re
+from typing import List, Optional
+
+import faiss
+import numpy as np
+
+# all-MiniLM-L6-v2 embeddings
+EMBEDDING_DIM = 384
+
+INDEX_TYPES = ("auto", "flat", "hnsw", "ivf")
+QUANTIZATIONS = ("none", "sq8", "pq")
+
+# Automatic choice by corpus size (vectors)
+FLAT_MAX_VECTORS = 20_000
+HNSW_MAX_VECTORS = 200_000
+
+# Quantization used when none is requested explicitly. SQ8 keeps recall@5 near
+# 0.99 at a quarter of the memory; PQ is 8x smaller again but loses much more
+# recall, so it is opt-in for corpora that do not fit otherwise.
+DEFAULT_QUANTIZATION = {"flat": "none", "hnsw": "sq8", "ivf": "sq8"}
+
+# Below this, trained indexes are unreliable and exact search is cheap anyway
+MIN_TRAINING_VECTORS = 10_000
+TRAIN_SAMPLE_SIZE = 100_000
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+IVF_NPROBE = 16
+# Bytes per PQ code; 384 dims split into 48 sub-vectors of 8 dims
+PQ_SUBQUANTIZERS = 48
+
+
+def choose_index_type(n_vectors: int) -> str:
+    if n_vectors <= FLAT_MAX_VECTORS:
+        return "flat"
+    if n_vectors <= HNSW_MAX_VECTORS:
+        return "hnsw"
+    return "ivf"
+
+
+def ivf_lists(n_vectors: int) -> int:
+    """Number of IVF cells: ~4*sqrt(n), with at least 39 training points each"""
+    nlist = 2 ** round(math.log2(max(4 * math.sqrt(n_vectors), 1)))
+    return max(16, min(nlist, 65536, n_vectors // 39))
+
+
+def index_spec(n_vectors: int, index_type: Optional[str] = "auto",
+               quantization: Optional[str] = None, dim: int = EMBEDDING_DIM) -> str:
+    """faiss.index_factory description for a corpus of n_vectors"""
+    index_type = (index_type or "auto").lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type}; expected one of {', '.join(INDEX_TYPES)}")
+    if index_type == "auto":
+        index_type = choose_index_type(n_vectors)
+
+    quantization = (quantization or DEFAULT_QUANTIZATION[index_type]).lower()
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantization}; expected one of {', '.join(QUANTIZATIONS)}")
+    if quantization == "pq" and dim % PQ_SUBQUANTIZERS:
+        raise ValueError(f"PQ{PQ_SUBQUANTIZERS} needs a dimension divisible by {PQ_SUBQUANTIZERS}, got {dim}")
+
+    trained = index_type == "ivf" or quantization != "none"
+    if trained and n_vectors < MIN_TRAINING_VECTORS:
+        index_type, quantization = "flat", "none"
+
+    codec = {"none": "Flat", "sq8": "SQ8", "pq": f"PQ{PQ_SUBQUANTIZERS}"}[quantization]
+    if index_type == "flat":
+        return codec
+    if index_type == "hnsw":
+        return f"HNSW{HNSW_M}" if quantization == "none" else f"HNSW{HNSW_M}_{codec}"
+    return f"IVF{ivf_lists(n_vectors)},{codec}"
+
+
+def configure_search(index, nprobe: int = IVF_NPROBE, ef_search: int = HNSW_EF_SEARCH):
+    """Apply query-time recall/latency knobs to an HNSW or IVF index"""
+    if hasattr(index, "hnsw"):
+        index.hnsw.efSearch = ef_search
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = nprobe
+    return index
+
+
+def create_index(spec: str, training_vectors: np.ndarray, dim: int = EMBEDDING_DIM,
+                 nprobe: int = IVF_NPROBE, ef_search: int = HNSW_EF_SEARCH):
+    """Empty index for spec, trained on a sample of training_vectors if needed"""
+    index = faiss.index_factory(dim, spec)
+    if hasattr(index, "hnsw"):
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    if not index.is_trained:
+        sample = training_vectors
+        if len(sample) > TRAIN_SAMPLE_SIZE:
+            rows = np.random.default_rng(0).choice(len(sample), TRAIN_SAMPLE_SIZE, replace=False)
+            sample = sample[rows]
+        index.train(np.ascontiguousarray(sample, dtype="float32"))
+    return configure_search(index, nprobe, ef_search)
+
+
+def training_size(spec: str, n_vectors: int, dim: int = EMBEDDING_DIM) -> int:
+    """Vectors to collect before an index for spec can be trained (0 if none)"""
+    if faiss.index_factory(dim, spec).is_trained:
+        return 0
+    match = re.match(r"IVF(\d+)", spec)
+    needed = 39 * int(match.group(1)) if match else MIN_TRAINING_VECTORS
+    return min(n_vectors, needed, TRAIN_SAMPLE_SIZE)
+
+
+def create_vectorstore(embeddings, index):
+    """LangChain FAISS vector store over an empty, trained index"""
+    from langchain.docstore import InMemoryDocstore
+    from langchain.vectorstores import FAISS
+
+    return FAISS(embeddings, index, InMemoryDocstore(), {})
+
+
+def add_vectors(vectorstore, documents: List, vectors: np.ndarray):
+    vectorstore.add_embeddings(
+        zip([doc.page_content for doc in documents], vectors),
+        metadatas=[doc.metadata for doc in documents]
+    )
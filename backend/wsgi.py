@@ -1,4 +1,7 @@
-from app import app
+from app import app, prewarm
+
+# Load heavy dependencies in the background while the worker starts serving
+prewarm()
  
 if __name__ == '__main__':
    app.run()
\ No newline at end of file
@@ -8,6 +8,9 @@ import { AlertTriangle, CheckCircle, Clock, Download, Send, FileText, PieChart a
 
 const API_BASE_URL = 'http://localhost:5000/api'; 
 
+// Client knowledge base, e.g. ?kb=acme; the backend falls back to its default
+const KB_ID = new URLSearchParams(window.location.search).get('kb') || undefined;
+
 
 // Types for our application
 interface Message {
@@ -26,39 +29,62 @@ interface Session {
 //   [key: string]: string;
 // }
 
+interface SurveyProgress {
+  risk_count: number;
+  solution_count: number;
+  risk_summary: string;
+}
+
 interface RiskReport {
   identified_risks: string[];
   unique_solutions: string[];
   risk_summary: string;
 }
 
+interface SolutionDetails {
+  name: string;
+  use_case: string;
+  links: string;
+  partners: string;
+  data_format: string;
+  immediate_actions: string[];
+  data_collation: string[];
+  dashboard: string[];
+  wearable: string[];
+  mobile: string[];
+  soc: string[];
+  audio_visual: string[];
+}
+
+// Solutions are listed once in `solutions`; risks reference them by ID
 interface DetailedReport {
   identified_risks: Array<{
     risk_type: string;
     mitigations: {
-      mitigations: {
-        tech: string[];
-        human: string[];
-        tss: string[];
-        analytics: string[];
-        policy: string[];
-      };
-      solution_details: {
-        [key: string]: {
-          use_case: string;
-          links: string;
-          partners: string;
-          data_format: string;
-          immediate_actions: string[];
-          data_collation: string[];
-          dashboard: string[];
-          wearable: string[];
-          mobile: string[];
-          soc: string[];
-          audio_visual: string[];
-        };
-      };
+      tech: string[];
+      human: string[];
+      tss: string[];
+      analytics: string[];
+      policy: string[];
     };
+    solution_ids: string[];
+  }>;
+  solutions: {
+    [id: string]: SolutionDetails;
+  };
+}
+
+// What each "No" answer accounts for on its own, biggest impact first;
+// conditional removals hold only if the skipped questions are answered "Yes"
+interface WhatIf {
+  identified_risks: number;
+  unique_solutions: number;
+  answers: Array<{
+    question: string;
+    risks_removed: string[];
+    solutions_removed: string[];
+    risks_conditional: string[];
+    solutions_conditional: string[];
   }>;
 }
 
@@ -118,6 +144,8 @@ const SecurityAssessment: React.FC = () => {
   const [activeTab, setActiveTab] = useState('chat');
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const [areaAnalysis, setAreaAnalysis] = useState<AreaAnalysis | null>(null);
+  const [whatIf, setWhatIf] = useState<WhatIf | null>(null);
+  const [progress, setProgress] = useState<SurveyProgress | null>(null);
   // Initialize the session when component mounts
   useEffect(() => {
     startSession();
@@ -137,7 +165,7 @@ const SecurityAssessment: React.FC = () => {
   const startSession = async () => {
     setLoading(true);
     try {
-      const response = await axios.post(`${API_BASE_URL}/start_session`);
+      const response = await axios.post(`${API_BASE_URL}/start_session`, { kb_id: KB_ID });
       setSession({
         id: response.data.session_id,
         state: response.data.state
@@ -192,6 +220,11 @@ const SecurityAssessment: React.FC = () => {
         }
       }
       
+      // Running risk totals maintained by the backend as answers arrive
+      if (response.data.progress) {
+        setProgress(response.data.progress);
+      }
+      
       addMessage(response.data.message, 'bot');
     } catch (error) {
       console.error('Error sending message:', error);
@@ -217,6 +250,7 @@ const SecurityAssessment: React.FC = () => {
 
         setShowDashboard(true);
         setActiveTab('dashboard');
+        fetchWhatIf();
       }
     } catch (error) {
       console.error('Error fetching report:', error);
@@ -224,6 +258,19 @@ const SecurityAssessment: React.FC = () => {
     }
   };
 
+  const fetchWhatIf = async () => {
+    if (!session) return;
+    
+    try {
+      const response = await axios.get(`${API_BASE_URL}/what_if`, {
+        params: { session_id: session.id }
+      });
+      setWhatIf(response.data);
+    } catch (error) {
+      console.error('Error fetching what-if analysis:', error);
+    }
+  };
+
 // Count nearby points of interest
 const countNearbyPoints = (areaData: AreaAnalysis) => {
   if (!areaData || !areaData.success) return [];
@@ -350,7 +397,7 @@ const countNearbyPoints = (areaData: AreaAnalysis) => {
     };
     
     detailedReport.identified_risks.forEach(risk => {
-      const mitigations = risk.mitigations.mitigations;
+      const mitigations = risk.mitigations;
       counts.Technical += mitigations.tech.length;
       counts.Human += mitigations.human.length;
       counts.TSS += mitigations.tss.length;
@@ -416,6 +463,12 @@ const countNearbyPoints = (areaData: AreaAnalysis) => {
       </div>
       
       <div className="border-t p-4 bg-white">
+        {progress && (
+          <div className="flex items-center text-sm text-gray-600 mb-2">
+            <AlertTriangle className="h-4 w-4 mr-1 text-red-500" />
+            <span>Risks so far: <strong>{progress.risk_count}</strong> &middot; Solutions: <strong>{progress.solution_count}</strong></span>
+          </div>
+        )}
         <div className="flex items-center">
           <input
             type="text"
@@ -629,6 +682,29 @@ const countNearbyPoints = (areaData: AreaAnalysis) => {
           </div>
         </div>
         
+        {/* Biggest Single Fixes */}
+        {whatIf && whatIf.answers.some(answer => answer.risks_removed.length + answer.risks_conditional.length > 0) && (
+          <div className="bg-white rounded-lg shadow p-4 mb-6">
+            <h3 className="font-semibold text-gray-600 mb-4">Biggest Single Fixes</h3>
+            <div className="space-y-2">
+              {whatIf.answers.filter(answer => answer.risks_removed.length + answer.risks_conditional.length > 0).map((answer, index) => (
+                <div key={index} className="p-2 bg-indigo-50 text-indigo-900 rounded">
+                  <div className="text-sm font-medium">{answer.question}</div>
+                  <div className="text-xs mt-1">
+                    Answering "Yes" removes {answer.risks_removed.length} of {whatIf.identified_risks} risks
+                    {answer.risks_removed.length > 0 && ` (${answer.risks_removed.join(', ')})`} and {answer.solutions_removed.length} solutions.
+                  </div>
+                  {answer.risks_conditional.length > 0 && (
+                    <div className="text-xs mt-1 text-gray-600">
+                      Also removes {answer.risks_conditional.join(', ')} if the questions the survey skipped are answered "Yes".
+                    </div>
+                  )}
+                </div>
+              ))}
+            </div>
+          </div>
+        )}
+        
         {/* Available Solutions */}
         <div className="bg-white rounded-lg shadow p-4">
           <h3 className="font-semibold text-gray-600 mb-4">Available Solutions</h3>